@@ -0,0 +1,38 @@
+import os
+import threading
+from datetime import datetime, timezone
+
+
+class FileCache:
+    """Parsed output files, kept until the file's mtime or size changes"""
+
+    def __init__(self):
+        self.entries = {}  # (path, parser) --> (mtime_ns, size, data)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def validators(path):
+        """(etag, last_modified, mtime_ns, size) of a file, or None if it is missing"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        etag = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+        last_modified = datetime.fromtimestamp(st.st_mtime, tz=timezone.utc)
+        return etag, last_modified, st.st_mtime_ns, st.st_size
+
+    def get(self, path, parse, stat=None):
+        """parse(path), re-run only when the file changed since the cached parse"""
+        stat = stat or self.validators(path)
+        if stat is None:
+            raise FileNotFoundError(path)
+        _, _, mtime_ns, size = stat
+        key = (path, parse)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] == mtime_ns and entry[1] == size:
+            return entry[2]
+        data = parse(path)
+        with self.lock:
+            self.entries[key] = (mtime_ns, size, data)
+        return data
@@ -0,0 +1,70 @@
+import json
+import os
+import time
+
+POLL_SECONDS = 0.5  # how often the streams look for new progress
+HEARTBEAT_SECONDS = 15  # comment line sent when idle, keeps proxies from closing the stream
+
+
+def sse(data, event=None):
+    """Format one Server-Sent Event"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+def tail_metrics(path, since=0):
+    """Stream the snapshots Evo.evolve appends to the metrics log (see profiler.MetricsLog)
+
+    Skips the first `since` snapshots, then follows the file like tail -f.
+    When a new run truncates the file, sends a "reset" event and starts over"""
+    offset = 0
+    skip = since
+    buffer = ""
+    last_sent = time.time()
+    while True:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < offset:  # a new run started a new series
+            offset, skip, buffer = 0, 0, ""
+            yield sse({}, event="reset")
+        if size > offset:
+            with open(path) as f:
+                f.seek(offset)
+                buffer += f.read()
+                offset = f.tell()
+            *lines, buffer = buffer.split("\n")  # keep a partly written last line for later
+            for line in lines:
+                if not line.strip():
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                yield sse(json.loads(line))
+                last_sent = time.time()
+        if time.time() - last_sent > HEARTBEAT_SECONDS:
+            yield ": heartbeat\n\n"
+            last_sent = time.time()
+        time.sleep(POLL_SECONDS)
+
+
+def follow_job(jobs, job_id):
+    """Stream a background job's progress snapshots, then a final "done" or "failed" event,
+    or "gone" if the job manager has forgotten the job"""
+    last_iteration = None
+    last_sent = time.time()
+    while True:
+        status = jobs.status(job_id)
+        if status is None:
+            yield sse({"id": job_id, "status": "gone"}, event="gone")
+            return
+        progress = status["progress"]
+        if progress is not None and progress["iteration"] != last_iteration:
+            last_iteration = progress["iteration"]
+            yield sse(progress)
+            last_sent = time.time()
+        if status["status"] in ("done", "failed"):
+            yield sse(status, event=status["status"])
+            return
+        if time.time() - last_sent > HEARTBEAT_SECONDS:
+            yield ": heartbeat\n\n"
+            last_sent = time.time()
+        time.sleep(POLL_SECONDS)
@@ -1,24 +1,142 @@
-from flask import Flask, jsonify
-from parser import parse_best_solution, parse_profiler_summary
+from flask import Flask, jsonify, request, send_file, abort, make_response, Response, stream_with_context
+from parser import parse_best_solution, parse_profiler_summary, parse_profile_json, parse_metrics
 import os
+import sys
+import threading
 from flask_cors import CORS
 
+# make the dstrut package importable when run as `python app/main.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dstrut.jobs import JobManager
+from cache import FileCache
+from events import tail_metrics, follow_job
+
 app = Flask(__name__)
 CORS(app)
 
-OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "../dstrut/output")
+OUTPUT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../dstrut/output"))
+
+cache = FileCache()
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+def get_jobs():
+    """The job manager, started on first use so importing the app stays cheap"""
+    global _jobs
+    if _jobs is None:
+        with _jobs_lock:  # requests arrive on several threads; start only one manager
+            if _jobs is None:
+                _jobs = JobManager()
+    return _jobs
+
+def cached_json(filename, parse, select=None, vary=""):
+    """JSON response for a parsed output file, served from the cache while the file is unchanged.
+    Sends ETag / Last-Modified and answers 304 when the client already has this version.
+    select(data) picks part of the parsed data; vary must then tell those parts apart in the ETag"""
+    path = os.path.join(OUTPUT_PATH, filename)
+    stat = cache.validators(path)
+    if stat is None:
+        abort(404)
+    etag, last_modified = stat[0] + vary, stat[1]
+
+    response = make_response()
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    data = cache.get(path, parse, stat)
+    response = jsonify(select(data) if select else data)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+def profile_from_text(path):
+    return {"functions": parse_profiler_summary(path)}
 
 @app.route("/api/final-results")
 def final_results():
-    path = os.path.join(OUTPUT_PATH, "best_solution.txt")
-    data = parse_best_solution(path)
-    return jsonify(data)
+    return cached_json("best_solution.txt", parse_best_solution)
 
 @app.route("/api/call-counts")
 def call_counts():
-    path = os.path.join(OUTPUT_PATH, "AlexK_profile.txt")
-    data = parse_profiler_summary(path)
-    return jsonify(data)
+    return cached_json("AlexK_profile.txt", parse_profiler_summary)
+
+@app.route("/api/profile")
+def profile():
+    """Structured profiler report (falls back to the text report from older runs)"""
+    if os.path.exists(os.path.join(OUTPUT_PATH, "AlexK_profile.json")):
+        return cached_json("AlexK_profile.json", parse_profile_json)
+    return cached_json("AlexK_profile.txt", profile_from_text)
+
+@app.route("/api/profile.csv")
+def profile_csv():
+    path = os.path.join(OUTPUT_PATH, "AlexK_profile.csv")
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(path, mimetype="text/csv", conditional=True)
+
+@app.route("/api/metrics")
+def metrics():
+    """Progress snapshots written during Evo.evolve; ?since=N returns only snapshots after the first N"""
+    since = max(0, request.args.get("since", default=0, type=int))
+    if not os.path.exists(os.path.join(OUTPUT_PATH, "AlexK_metrics.jsonl")):
+        return jsonify([])  # no run has started yet
+    return cached_json("AlexK_metrics.jsonl", parse_metrics, select=lambda data: data[since:], vary=f"-{since}")
+
+def event_stream(events):
+    """Server-Sent Events response around a generator of formatted events"""
+    return Response(stream_with_context(events), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/events")
+def events():
+    """Live progress of the current run as Server-Sent Events; ?since=N skips the first N snapshots"""
+    since = max(0, request.args.get("since", default=0, type=int))
+    return event_stream(tail_metrics(os.path.join(OUTPUT_PATH, "AlexK_metrics.jsonl"), since))
+
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    """Start an optimization run: {"problem": ..., "time_limit": seconds, "seed": int}, all optional"""
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "request body must be a JSON object"}), 400
+    try:
+        job_id = get_jobs().submit(body.get("problem"), body.get("time_limit", 15), body.get("seed"))
+    except (ValueError, KeyError, TypeError, OSError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(get_jobs().status(job_id)), 202
+
+@app.route("/api/jobs")
+def list_jobs():
+    jobs = get_jobs()
+    statuses = [jobs.status(job_id) for job_id in list(jobs.jobs)]
+    return jsonify([status for status in statuses if status is not None])
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    status = get_jobs().status(job_id)
+    if status is None:
+        abort(404)
+    return jsonify(status)
+
+@app.route("/api/jobs/<job_id>/events")
+def job_events(job_id):
+    """Live progress of a background job as Server-Sent Events"""
+    if get_jobs().status(job_id) is None:
+        abort(404)
+    return event_stream(follow_job(get_jobs(), job_id))
+
+@app.route("/api/jobs/<job_id>/front")
+def job_front(job_id):
+    status = get_jobs().status(job_id)
+    if status is None:
+        abort(404)
+    if status["status"] != "done":
+        return jsonify(status), 409
+    return jsonify(get_jobs().front(job_id))
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    app.run(host="0.0.0.0", port=5000, threaded=True)  # each SSE client holds a thread
@@ -1,14 +1,16 @@
 import os
+import json
 
 def get_output_path(filename):
-    """Return full path to backend/output/filename"""
-    base_dir = os.path.dirname(__file__)
-    output_dir = os.path.join(base_dir, "output")
+    """Return full path to dstrut/output/filename"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output_dir = os.path.join(base_dir, "dstrut", "output")
     return os.path.join(output_dir, filename)
 
-def parse_best_solution(filename="best_solution.txt"):
+def parse_best_solution(filepath=None):
     """Parse best_solution.txt into a dictionary"""
-    filepath = get_output_path(filename)
+    if filepath is None:
+        filepath = get_output_path("best_solution.txt")
     result = {}
     with open(filepath) as f:
         for line in f:
@@ -32,19 +34,40 @@ def parse_profiler_summary(filename="AlexK_profile.txt"):
         parts = line.split()
         if len(parts) < 4:
             continue
-        # The last 3 parts are Calls, Total Time, Avg Time
-        func_name = " ".join(parts[:-3])
+        # Function, Calls, Total Time, Avg Time, then p50, p95, p99 in newer reports
+        func_name = parts[0]
         try:
-            calls = int(parts[-3])
-            total_time = float(parts[-2])
-            avg_time = float(parts[-1])
-            data.append({
+            row = {
                 "function": func_name,
-                "calls": calls,
-                "total_time": total_time,
-                "avg_time": avg_time
-            })
+                "calls": int(parts[1]),
+                "total_time": float(parts[2]),
+                "avg_time": float(parts[3])
+            }
+            for key, val in zip(["p50", "p95", "p99"], parts[4:7]):
+                row[key] = float(val)
+            data.append(row)
         except ValueError:
             # skip lines that can't be parsed
             continue
     return data
+
+
+def parse_profile_json(filename="AlexK_profile.json"):
+    """Load the structured profiler report"""
+    with open(filename) as f:
+        return json.load(f)
+
+def parse_metrics(filename="AlexK_metrics.jsonl", since=0):
+    """Progress snapshots from the metrics log, skipping the first `since` lines"""
+    data = []
+    if not os.path.exists(filename):
+        return data
+    with open(filename) as f:
+        for i, line in enumerate(f):
+            if i < since or not line.strip():
+                continue
+            try:
+                data.append(json.loads(line))
+            except ValueError:
+                break  # last line still being written
+    return data
@@ -0,0 +1,127 @@
+"""
+File: archive.py
+Description: The population store used by Evo.
+
+An Archive behaves like the dict Evo used to keep (scores tuple -->
+solution) but also keeps its keys in a list, so a random member can be
+drawn in O(1), and can be capped in size. Once the cap is reached, the
+least diverse members are evicted, by crowding distance or by keeping one
+member per epsilon box.
+
+"""
+
+import numpy as np
+from dstrut.pareto import non_dominated, crowding_distance, epsilon_representatives
+
+
+class Archive:
+
+    def __init__(self, max_size=None, eviction="crowding", epsilon=1, slack=None, codec=None, rng=None):
+        """ Constructor
+
+        max_size - cap on the number of members (None = unbounded)
+        eviction - "crowding" or "epsilon"
+        epsilon - box size on every objective for "epsilon" eviction
+        slack - how far the archive may overshoot max_size between trims
+                (defaults to 10% of max_size); trim() always cuts back to max_size
+        codec - optional (encode, decode) pair: members are stored encoded (e.g. bit-packed,
+                see dstrut.packed) and every read decodes a fresh solution
+        rng - numpy Generator to sample with (Evo passes its own) """
+        if eviction not in ("crowding", "epsilon"):
+            raise ValueError(f"Unknown eviction strategy: {eviction}")
+        self.max_size = max_size
+        self.eviction = eviction
+        self.epsilon = epsilon
+        if slack is None:
+            slack = max(1, max_size // 10) if max_size else 0
+        self.slack = slack
+        self.encode, self.decode = codec if codec else (None, None)
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self._solutions = {}  # scores (tuple) --> solution
+        self._keys = []  # the same keys, for O(1) random sampling
+        self._index = {}  # key --> position in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._solutions
+
+    def __iter__(self):
+        return iter(self._solutions)
+
+    def __getitem__(self, key):
+        if self.decode:
+            return self.decode(self._solutions[key])
+        return self._solutions[key]
+
+    def __setitem__(self, key, sol):
+        if key not in self._solutions:
+            self._index[key] = len(self._keys)
+            self._keys.append(key)
+        self._solutions[key] = self.encode(sol) if self.encode else sol
+        if self.max_size is not None and len(self._keys) > self.max_size + self.slack:
+            self.trim()
+
+    def __delitem__(self, key):
+        """ Swap the last key into the removed key's slot so removal stays O(1) """
+        del self._solutions[key]
+        pos = self._index.pop(key)
+        last = self._keys.pop()
+        if pos < len(self._keys):
+            self._keys[pos] = last
+            self._index[last] = pos
+
+    def keys(self):
+        return self._solutions.keys()
+
+    def values(self):
+        if self.decode:
+            return [self.decode(sol) for sol in self._solutions.values()]
+        return self._solutions.values()
+
+    def items(self):
+        if self.decode:
+            return [(key, self.decode(sol)) for key, sol in self._solutions.items()]
+        return self._solutions.items()
+
+    def stored(self, key):
+        """ The member under key exactly as stored (still encoded, not a copy) """
+        return self._solutions[key]
+
+    def sample_key(self):
+        """ A uniformly random key, in O(1) """
+        return self._keys[int(self.rng.random() * len(self._keys))]  # cheaper than a scalar rng.integers
+
+    def sample(self):
+        """ A uniformly random solution, in O(1) """
+        return self[self.sample_key()]
+
+    def scores(self, keys=None):
+        """ (n, k) score matrix for keys (default: every member, in sampling order) """
+        keys = self._keys if keys is None else keys
+        return np.array([[score for name, score in key] for key in keys])
+
+    def retain(self, keys):
+        """ Keep only the given keys """
+        solutions = self._solutions
+        self._solutions = {key: solutions[key] for key in keys}
+        self._keys = list(self._solutions)
+        self._index = {key: i for i, key in enumerate(self._keys)}
+
+    def trim(self):
+        """ Drop dominated members, then evict the least diverse ones down to max_size """
+        if not self._keys:
+            return
+        keys = [key for key, keep in zip(self._keys, non_dominated(self.scores())) if keep]
+
+        if self.max_size is not None and len(keys) > self.max_size:
+            if self.eviction == "epsilon":
+                keys = [keys[i] for i in epsilon_representatives(self.scores(keys), self.epsilon)]
+            if len(keys) > self.max_size:
+                crowding = crowding_distance(self.scores(keys))
+                most_isolated = np.argsort(-crowding, kind="stable")[:self.max_size]
+                keys = [keys[i] for i in np.sort(most_isolated)]
+
+        self.retain(keys)
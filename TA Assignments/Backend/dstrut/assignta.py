@@ -1,156 +1,130 @@
 
 from dstrut.evo_p import Evo
-from dstrut.profiler import build_profiles, profile, profiler
+from dstrut.profiler import build_profiles, profile, profiler, MetricsLog
+from dstrut.problem import Problem, Tally, as_problem
+from dstrut.islands import run_islands
+from dstrut.packed import PackedSolution
+from dstrut.scheduler import BanditScheduler
+from dstrut.pareto import hypervolume, igd, non_dominated
+from dstrut.seeding import seed_solutions
 import numpy as np
-import random
+import pandas as pd
+import os
 import time
+from functools import partial
 from dstrut.evo_p import get_output_path
 
 
-@profile
-def overallocation(solution, tas):
-    """ Counts the overallocation of each TA"""
-    assigned = solution.sum(axis=1) # array summing all the ta's/cols
-    max_allowed = np.array([ta.max_assigned for ta in tas]) # extracts max from each ta object in list
-    overallocations = np.maximum(0, assigned - max_allowed) # removes underallocations
-
-    return int(overallocations.sum())
-
-@profile
-def conflicts(solution, sections):
-    """ Check for time conflicts"""
-
-    ta_assignments = {}
+SHAPE = (40, 17)  # (n_tas, n_sections) of the assignta_data problem, the agents' default
+OBJECTIVES = ["overallocation", "conflicts", "undersupport", "unavailable", "unpreferred"]
+HV_SAMPLES = 20000  # Monte Carlo points behind the hypervolume reported while evolving
+REF_FLOOR = 10  # smallest reference point score on any objective
 
-    for ta_id in range(solution.shape[0]):
-        for section_id in range(solution.shape[1]):
-            if solution[ta_id][section_id] == 1:
-                if ta_id not in ta_assignments:
-                    ta_assignments[ta_id] = []
-                ta_assignments[ta_id].append(section_id)
 
-    conflict_count = 0
+def _score(values):
+    """ Return a python int for a single solution, or an int array for a stacked batch """
+    if np.ndim(values) == 0:
+        return int(values)
+    return values.astype(int)
 
-    for ta_id, assigned_sections in ta_assignments.items():
-        if len(assigned_sections) <= 1:
-            continue
+# The objectives accept one (n_tas, n_sections) solution, a stacked
+# (N, n_tas, n_sections) batch, or a PackedSolution, returning one score per solution
 
-        has_conflict = False
-        for i in range(len(assigned_sections)):
-            for j in range(i + 1, len(assigned_sections)):
-                section1_id = assigned_sections[i]
-                section2_id = assigned_sections[j]
-
-                time1 = sections[section1_id].daytime
-                time2 = sections[section2_id].daytime
+@profile
+def overallocation(solution, problem):
+    """ Counts the overallocation of each TA"""
+    problem = as_problem(problem)
+    if isinstance(solution, PackedSolution):
+        return solution.overallocation(problem)
+    assigned = solution.sum(axis=-1) # array summing all the ta's/cols
+    overallocations = np.maximum(0, assigned - problem.max_assigned) # removes underallocations
 
-                if time1 == time2:
-                    has_conflict = True
-                    break
-            if has_conflict:
-                break
+    return _score(overallocations.sum(axis=-1))
 
-        if has_conflict:
-            conflict_count += 1
+@profile
+def conflicts(solution, problem):
+    """ Check for time conflicts"""
+    problem = as_problem(problem)
+    if isinstance(solution, PackedSolution):
+        return solution.conflicts(problem)
+    per_timeslot = solution @ problem.incidence # sections each ta holds in each timeslot
+    has_conflict = (per_timeslot > 1).any(axis=-1)
 
-    return conflict_count
+    return _score(has_conflict.sum(axis=-1))
 
 @profile
-def undersupport(solution, sections):
+def undersupport(solution, problem):
     """ Ensure there is enough TA's per class"""
-    per_class = solution.sum(axis=0)
-    min_class = np.array([section.min_ta for section in sections])
-    support = np.maximum(0, min_class - per_class)
+    problem = as_problem(problem)
+    if isinstance(solution, PackedSolution):
+        return solution.undersupport(problem)
+    per_class = solution.sum(axis=-2)
+    support = np.maximum(0, problem.min_ta - per_class)
 
-    return int(support.sum())
+    return _score(support.sum(axis=-1))
 
 @profile
-def unavailable(solution, tas):
+def unavailable(solution, problem):
     """ Checks for TA availability"""
-    unavailable_set = set()
-    for ta_idx, ta in enumerate(tas):
-        for section_id, preference in ta.preferences.items():
-            if preference == 'U':
-                unavailable_set.add((ta_idx, int(section_id)))
-
-    assigned_tas, assigned_sections = np.where(solution == 1)
+    problem = as_problem(problem)
+    if isinstance(solution, PackedSolution):
+        return solution.unavailable(problem)
 
-    violations = 0
-    for ta_idx, section_idx in zip(assigned_tas, assigned_sections):
-        if (ta_idx, section_idx) in unavailable_set:
-            violations += 1
-
-    return violations
+    return _score((solution * problem.unavailable).sum(axis=(-2, -1)))
 
 @profile
-def unpreferred(solution, tas):
+def unpreferred(solution, problem):
     """ Checks for TA willing to but not wanting to"""
-    unpreferred_set = set()
-    for ta_idx, ta in enumerate(tas):
-        for section_id, preference in ta.preferences.items():
-            if preference == 'W':
-                unpreferred_set.add((ta_idx, int(section_id)))
+    problem = as_problem(problem)
+    if isinstance(solution, PackedSolution):
+        return solution.unpreferred(problem)
+
+    return _score((solution * problem.unpreferred).sum(axis=(-2, -1)))
 
-    assigned_tas, assigned_sections = np.where(solution == 1)
 
-    violations = 0
-    for ta_idx, section_idx in zip(assigned_tas, assigned_sections):
-        if (ta_idx, section_idx) in unpreferred_set:
-            violations += 1
+# The agents take the solution shape from their parents; shape is only used
+# when there are none (build_evo binds it to the problem's shape).
+# Solutions are int8: a 0/1 matrix needs no more, and big problems stay small in the archive
+# Every random choice comes from rng, the Evo's generator (build_evo registers the agents
+# as seeded), so a seeded Evo replays the same run; called on their own they use _RNG
 
-    return violations
+_RNG = np.random.default_rng()
 
 
 @profile
-def random_solution_agent(solutions):
+def random_solution_agent(solutions, shape=SHAPE, rng=None):
     """Generate a completely random solution"""
-    return np.random.randint(0, 2, size=(40, 17))
+    rng = _RNG if rng is None else rng
+    return rng.integers(0, 2, size=shape, dtype=np.int8)
 
 
 @profile
-def swap_assignment_agent(solutions):
-    """Randomly swap some TA assignments"""
+def swap_assignment_agent(solutions, shape=SHAPE, rng=None):
+    """Randomly swap some TA assignments
+    Returns (solution, flipped cells) so Evo can score it incrementally"""
+    rng = _RNG if rng is None else rng
     if not solutions:
-        return random_solution_agent([])
+        return random_solution_agent([], shape, rng), None
 
     solution = solutions[0].copy()
+    n_tas, n_sections = solution.shape
 
-    num_swaps = random.randint(1, 10)
+    num_swaps = rng.integers(1, 11)
+    flipped = []
 
-    for _ in range(num_swaps):
-        ta = random.randint(0, 39)
-        section = random.randint(0, 16)
+    for ta, section in zip(rng.integers(0, n_tas, num_swaps).tolist(), rng.integers(0, n_sections, num_swaps).tolist()):
         solution[ta][section] = 1 - solution[ta][section]
+        flipped.append((ta, section))
 
-    return solution
+    return solution, flipped
 
 
 @profile
-def conflict_reduction_agent(solutions):
-    """Try to reduce conflicts by removing some assignments from overloaded TAs"""
-    if not solutions:
-        return random_solution_agent([])
-
-    solution = solutions[0].copy()
-
-    for ta in range(40):
-        assigned_sections = np.where(solution[ta] == 1)[0]
-        if len(assigned_sections) > 2:
-            sections_to_remove = random.sample(
-                list(assigned_sections),
-                random.randint(1, min(3, len(assigned_sections) - 1))
-            )
-            for section in sections_to_remove:
-                solution[ta][section] = 0
-
-    return solution
-
-
-@profile
-def workload_balancing_agent(solutions):
+def workload_balancing_agent(solutions, shape=SHAPE, rng=None):
     """Try to balance workloads by redistributing assignments"""
+    rng = _RNG if rng is None else rng
     if not solutions:
-        return random_solution_agent([])
+        return random_solution_agent([], shape, rng)
 
     solution = solutions[0].copy()
 
@@ -160,12 +134,12 @@ def workload_balancing_agent(solutions):
 
     if len(overloaded) > 0 and len(underloaded) > 0:
         for _ in range(min(5, len(overloaded))):
-            from_ta = random.choice(overloaded)
-            to_ta = random.choice(underloaded)
+            from_ta = rng.choice(overloaded)
+            to_ta = rng.choice(underloaded)
 
             assigned_sections = np.where(solution[from_ta] == 1)[0]
             if len(assigned_sections) > 0:
-                section = random.choice(assigned_sections)
+                section = rng.choice(assigned_sections)
                 solution[from_ta][section] = 0
                 solution[to_ta][section] = 1
 
@@ -173,10 +147,11 @@ def workload_balancing_agent(solutions):
 
 
 @profile
-def section_coverage_agent(solutions):
+def section_coverage_agent(solutions, shape=SHAPE, rng=None):
     """Try to ensure all sections have adequate coverage"""
+    rng = _RNG if rng is None else rng
     if not solutions:
-        return random_solution_agent([])
+        return random_solution_agent([], shape, rng)
 
     solution = solutions[0].copy()
 
@@ -186,9 +161,10 @@ def section_coverage_agent(solutions):
     for section in low_coverage_sections:
         available_tas = np.where(solution[:, section] == 0)[0]
         if len(available_tas) > 0:
-            tas_to_assign = random.sample(
-                list(available_tas),
-                min(random.randint(1, 2), len(available_tas))
+            tas_to_assign = rng.choice(
+                available_tas,
+                min(rng.integers(1, 3), len(available_tas)),
+                replace=False
             )
             for ta in tas_to_assign:
                 solution[ta][section] = 1
@@ -197,96 +173,247 @@ def section_coverage_agent(solutions):
 
 
 @profile
-def crossover_agent(solutions):
+def crossover_agent(solutions, shape=SHAPE, rng=None):
     """Combine two solutions to create a new one"""
+    rng = _RNG if rng is None else rng
     if len(solutions) < 2:
-        return random_solution_agent([])
+        return random_solution_agent([], shape, rng)
 
     parent1, parent2 = solutions[0], solutions[1]
     child = parent1.copy()
 
-    for ta in range(40):
-        if random.random() < 0.5:
-            child[ta] = parent2[ta].copy()
+    from_parent2 = rng.random(len(child)) < 0.5  # each TA's row comes from either parent
+    child[from_parent2] = parent2[from_parent2]
 
     return child
 
 
 @profile
-def mutation_agent(solutions):
-    """Apply small random mutations to a solution"""
+def mutation_agent(solutions, shape=SHAPE, rng=None):
+    """Apply small random mutations to a solution
+    Returns (solution, flipped cells) so Evo can score it incrementally"""
+    rng = _RNG if rng is None else rng
     if not solutions:
-        return random_solution_agent([])
+        return random_solution_agent([], shape, rng), None
 
     solution = solutions[0].copy()
+    n_tas, n_sections = solution.shape
 
-    num_mutations = random.randint(1, 5)
+    num_mutations = rng.integers(1, 6)
+    flipped = []
 
-    for _ in range(num_mutations):
-        ta = random.randint(0, 39)
-        section = random.randint(0, 16)
-        if random.random() < 0.5:
+    tas = rng.integers(0, n_tas, num_mutations).tolist()
+    sections = rng.integers(0, n_sections, num_mutations).tolist()
+    for ta, section, flip in zip(tas, sections, (rng.random(num_mutations) < 0.5).tolist()):
+        if flip:
             solution[ta][section] = 1 - solution[ta][section]
+            flipped.append((ta, section))
+
+    return solution, flipped
+
+
+# Repair agents: each fixes one kind of violation, touching only the offending
+# cells (found with the Problem's masks) and keeping the assignments TAs like best.
+# They are delta agents, so Evo scores their children incrementally
+
+def _changed(parent, child):
+    """ (ta, section) cells where child differs from parent """
+    return list(map(tuple, np.argwhere(child != parent).tolist()))
 
-    return solution
+
+def _preference(problem, shape, rng):
+    """ How much each TA wants each section: 2 preferred, 1 willing, 0 unavailable,
+    plus a random fraction so ties break differently every call """
+    return 2 - problem.unpreferred - 2 * problem.unavailable + rng.random(shape)
 
 
 @profile
-def constraint_repair_agent(solutions):
-    """Try to repair constraint violations"""
+def drop_unavailable_agent(solutions, problem, rng=None):
+    """Remove every assignment of a TA to a section they are unavailable for"""
+    rng = _RNG if rng is None else rng
     if not solutions:
-        return random_solution_agent([])
+        return random_solution_agent([], problem.shape, rng), None
 
-    solution = solutions[0].copy()
+    parent = solutions[0]
+    child = parent * (1 - problem.unavailable).astype(parent.dtype)
+    return child, _changed(parent, child)
 
-    for ta in range(40):
-        assigned_sections = np.where(solution[ta] == 1)[0]
-        if len(assigned_sections) > 4:
-            excess = len(assigned_sections) - 4
-            sections_to_remove = random.sample(list(assigned_sections), excess)
-            for section in sections_to_remove:
-                solution[ta][section] = 0
 
-    return solution
+@profile
+def resolve_clashes_agent(solutions, problem, rng=None):
+    """Leave each TA at most one section per timeslot, keeping the one they like best"""
+    rng = _RNG if rng is None else rng
+    if not solutions:
+        return random_solution_agent([], problem.shape, rng), None
+
+    parent = solutions[0]
+    child = parent.copy()
+    per_timeslot = parent @ problem.incidence
+    clashing = (per_timeslot > 1).any(axis=1)
+    if clashing.any():
+        rows = np.flatnonzero(clashing)
+        liking = np.where(parent[rows] == 1, _preference(problem, parent.shape, rng)[rows], -1)
+        for slot in np.flatnonzero((per_timeslot[rows] > 1).any(axis=0)):
+            sections = np.flatnonzero(problem.slot_of == slot)
+            held = child[rows][:, sections]
+            keep = np.zeros_like(held)
+            keep[np.arange(len(rows)), liking[:, sections].argmax(axis=1)] = 1
+            child[np.ix_(rows, sections)] = held * keep
+    return child, _changed(parent, child)
 
 
-def main():
-    """Main optimization function"""
+@profile
+def trim_overallocated_agent(solutions, problem, rng=None):
+    """Cut every overallocated TA back to max_assigned, dropping their least liked sections"""
+    rng = _RNG if rng is None else rng
+    if not solutions:
+        return random_solution_agent([], problem.shape, rng), None
 
-    profiler.start_profiling()
+    parent = solutions[0]
+    over = parent.sum(axis=1) > problem.max_assigned
+    child = parent.copy()
+    if over.any():
+        rows = np.flatnonzero(over)
+        liking = np.where(parent[rows] == 1, _preference(problem, parent.shape, rng)[rows], -np.inf)
+        rank = np.argsort(np.argsort(-liking, axis=1), axis=1)  # 0 = best liked
+        child[rows] = parent[rows] * (rank < problem.max_assigned[rows, None])
+    return child, _changed(parent, child)
 
-    print("Loading data...")
-    sections, tas = build_profiles("assignta_data/sections.csv", "assignta_data/tas.csv")
-    print(f"Loaded {len(sections)} sections and {len(tas)} TAs")
 
-    E = Evo()
+@profile
+def fill_undersupport_agent(solutions, problem, rng=None):
+    """Give each undersupported section more TAs, picking TAs who are available,
+    have room under max_assigned and are free in that timeslot, preferred ones first"""
+    rng = _RNG if rng is None else rng
+    if not solutions:
+        return random_solution_agent([], problem.shape, rng), None
+
+    parent = solutions[0]
+    child = parent.copy()
+    assigned = parent.sum(axis=1)
+    per_timeslot = parent @ problem.incidence
+    missing = problem.min_ta - parent.sum(axis=0)
+    liking = _preference(problem, parent.shape, rng)
+
+    for section in rng.permutation(np.flatnonzero(missing > 0)):
+        slot = problem.slot_of[section]
+        candidates = np.flatnonzero((child[:, section] == 0) & (problem.unavailable[:, section] == 0)
+                                    & (assigned < problem.max_assigned) & (per_timeslot[:, slot] == 0))
+        chosen = candidates[np.argsort(-liking[candidates, section])][:missing[section]]
+        child[chosen, section] = 1
+        assigned[chosen] += 1
+        per_timeslot[chosen, slot] += 1
+    return child, _changed(parent, child)
+
+
+def reference_point(problem, front=None, margin=0.1, floor=REF_FLOOR):
+    """Hypervolume reference point: just past the nadir (worst score on each objective) of
+    front, by default the scores of the min-cost flow seeds, which depend only on the problem.
+    floor keeps every objective's range wide enough to tell a few penalties apart (the seeds
+    may have none at all on some objectives)"""
+    problem = as_problem(problem)
+    if front is None:
+        objectives = [overallocation, conflicts, undersupport, unavailable, unpreferred]
+        front = [[f(sol, problem) for f in objectives] for sol in seed_solutions(problem)]
+    nadir = np.asarray(front, dtype=float).max(axis=0)
+    return np.maximum(np.ceil(nadir * (1 + margin)), floor)
+
+
+def load_front(path):
+    """Score matrix of a front saved by update_front (empty if there is none yet)"""
+    if not os.path.exists(path):
+        return np.zeros((0, len(OBJECTIVES)))
+    return pd.read_csv(path)[OBJECTIVES].to_numpy()
+
+
+def update_front(path, scores):
+    """Merge scores into the best known front kept at path, returning the merged front.
+    Kept across runs, it is the reference front that IGD is measured against"""
+    merged = np.unique(np.vstack([load_front(path), np.asarray(scores)]), axis=0)
+    merged = merged[non_dominated(merged)]
+    pd.DataFrame(merged, columns=OBJECTIVES).to_csv(path, index=False)
+    return merged
+
+
+def build_evo(sections_file="assignta_data/sections.csv", tas_file="assignta_data/tas.csv", problem=None,
+              archive_size=500, reference_front=None, flow_seeds=True, seed=None):
+    """Build an Evo with the assignta objectives and agents, seeded with min-cost flow
+    solutions (see dstrut.seeding; flow_seeds=False skips them) and random ones
+    Scores against problem if given, otherwise against the two CSV files
+    Snapshots report the normalized hypervolume of the front, and its IGD to
+    reference_front (a score matrix, e.g. from load_front) when one is given
+    seed makes the run reproducible (see Evo)"""
+    if problem is None:
+        problem = Problem(*build_profiles(sections_file, tas_file))
+    shape = problem.shape
+
+    E = Evo(archive_size=archive_size, seed=seed)
 
     # objectives
-    E.add_objective("overallocation", lambda sol: overallocation(sol, tas))
-    E.add_objective("conflicts", lambda sol: conflicts(sol, sections))
-    E.add_objective("undersupport", lambda sol: undersupport(sol, sections))
-    E.add_objective("unavailable", lambda sol: unavailable(sol, tas))
-    E.add_objective("unpreferred", lambda sol: unpreferred(sol, tas))
+    E.add_objective("overallocation", lambda sol: overallocation(sol, problem), batched=True)
+    E.add_objective("conflicts", lambda sol: conflicts(sol, problem), batched=True)
+    E.add_objective("undersupport", lambda sol: undersupport(sol, problem), batched=True)
+    E.add_objective("unavailable", lambda sol: unavailable(sol, problem), batched=True)
+    E.add_objective("unpreferred", lambda sol: unpreferred(sol, problem), batched=True)
 
     # agents
-    E.add_agent("random_solution", random_solution_agent, 0)
-    E.add_agent("swap_assignment", swap_assignment_agent, 1)
-    E.add_agent("conflict_reduction", conflict_reduction_agent, 1)
-    E.add_agent("workload_balancing", workload_balancing_agent, 1)
-    E.add_agent("section_coverage", section_coverage_agent, 1)
-    E.add_agent("crossover", crossover_agent, 2)
-    E.add_agent("mutation", mutation_agent, 1)
-    E.add_agent("constraint_repair", constraint_repair_agent, 1)
-
-    # Seed with some initial solutions
+    E.add_agent("random_solution", partial(random_solution_agent, shape=shape), 0, seeded=True)
+    E.add_agent("swap_assignment", partial(swap_assignment_agent, shape=shape), 1, delta=True, seeded=True)
+    E.add_agent("workload_balancing", partial(workload_balancing_agent, shape=shape), 1, seeded=True)
+    E.add_agent("section_coverage", partial(section_coverage_agent, shape=shape), 1, seeded=True)
+    E.add_agent("crossover", partial(crossover_agent, shape=shape), 2, seeded=True)
+    E.add_agent("mutation", partial(mutation_agent, shape=shape), 1, delta=True, seeded=True)
+    E.add_agent("drop_unavailable", partial(drop_unavailable_agent, problem=problem), 1, delta=True, seeded=True)
+    E.add_agent("resolve_clashes", partial(resolve_clashes_agent, problem=problem), 1, delta=True, seeded=True)
+    E.add_agent("trim_overallocated", partial(trim_overallocated_agent, problem=problem), 1, delta=True, seeded=True)
+    E.add_agent("fill_undersupport", partial(fill_undersupport_agent, problem=problem), 1, delta=True, seeded=True)
+    E.set_tally(lambda sol: Tally(problem, sol))
+    E.set_scheduler(BanditScheduler())
+
+    # front quality, both measured in objective space scaled by the reference point: past the
+    # flow seeds, or in a run without them (the min-cost flow is slow at scale) past the
+    # reference front if there is one, else just the floor
+    seeds = seed_solutions(problem) if flow_seeds else []
+    if len(seeds):
+        ref = reference_point(problem, E.evaluate(seeds))
+    elif reference_front is not None and len(reference_front):
+        ref = reference_point(problem, reference_front)
+    else:
+        ref = reference_point(problem, np.zeros((1, len(OBJECTIVES))))
+    E.add_indicator("hypervolume", lambda scores: hypervolume(scores / ref, np.ones(len(ref)), samples=HV_SAMPLES))
+    if reference_front is not None and len(reference_front):
+        reference_front = np.asarray(reference_front) / ref
+        E.add_indicator("igd", lambda scores: igd(scores / ref, reference_front))
+
+    # Seed with near optimal solutions, plus random ones for diversity
+    for sol in seeds:
+        E.add_solution(sol)
     for _ in range(20):
-        E.add_solution(np.random.randint(0, 2, size=(40, 17)))
+        E.add_solution(random_solution_agent([], shape, E.rng))
+
+    return E
 
+
+def main(islands=1):
+    """Main optimization function
+    islands > 1 spreads the run over that many worker processes (see dstrut.islands)"""
+
+    profiler.start_profiling()
+
+    print("Loading data...")
+    front_path = get_output_path("AlexK_front.csv")
+    make_evo = partial(build_evo, reference_front=load_front(front_path))
+    E = make_evo()
     print(f"Initial population: {len(E.pop)} solutions")
+    metrics = MetricsLog("AlexK_metrics.jsonl", profiler)
 
     # starting the optomization
     start_time = time.time()
-    E.evolve(n=1000000, dom=50, sync=999999, time_limit=15)
+    if islands > 1:
+        E = run_islands(make_evo, islands, time_limit=15, migrate_every=3, dom=50, batch=16, listeners=[metrics])
+    else:
+        E.add_listener(metrics)
+        E.evolve(n=1000000, dom=50, sync=2000, time_limit=15, batch=16)
     end_time = time.time()
 
     optimization_time = end_time - start_time
@@ -298,7 +425,10 @@ def main():
 
 
     summary_df = E.save_summary("AlexK_summary.csv")
+    update_front(front_path, E.pop.scores())
     profiler.save_report("AlexK_profile.txt")
+    profiler.save_json("AlexK_profile.json")
+    profiler.save_csv("AlexK_profile.csv")
 
     best_solution_path = get_output_path("best_solution.txt")
 
@@ -331,4 +461,9 @@ def main():
         max_val = summary_df[obj].max()
         print(f"  {obj}: {min_val} - {max_val}")
 
-main()
\ No newline at end of file
+    print("Agent credit (offspring kept / produced):")
+    for name, stats in E.agent_stats().items():
+        print(f"  {name}: {stats['kept']} / {stats['calls']} (pick probability {stats['weight']:.2f})")
+
+if __name__ == "__main__":
+    main()
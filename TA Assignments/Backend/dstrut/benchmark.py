@@ -0,0 +1,118 @@
+"""
+File: benchmark.py
+Description: Throughput and front quality of the assignta optimizer by problem size.
+
+For each scale, generates a synthetic problem that many times the size of
+the real term (see dstrut.generate), evolves it for a fixed time and
+reports evaluations per second together with the hypervolume of the
+final front. The hypervolume is normalized by the box between the origin
+and assignta.reference_point (just past the worst scores of the min-cost
+flow seeds, with a floor of REF_FLOOR on each objective), so 1.0 would be
+a perfect solution, the flow seeds alone score close to it, random
+solutions score 0 and sizes can be compared side by side. Runs without
+flow seeds measure against the floor alone. Run it before and after a change to
+see whether the optimizer got slower, or worse, at scale.
+
+time_to_target answers whether a change speeds up convergence: over
+several seeds, how long the optimizer takes to first reach a target
+hypervolume. It starts from random solutions only by default, since
+the min-cost flow seeds (dstrut.seeding) land near the target at once.
+
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from dstrut.assignta import build_evo
+from dstrut.evo_p import get_output_path
+from dstrut.generate import generate_scaled
+from dstrut.problem import Problem
+from dstrut.profiler import profiles_from_frames, profiler
+
+
+def _evolve(problem, time_limit, seed, batch, archive_size, flow_seeds):
+    """ Seeded run on problem: (seconds spent building the Evo, its snapshots) """
+    build_start = time.time()
+    E = build_evo(problem=problem, archive_size=archive_size, flow_seeds=flow_seeds, seed=seed)
+    build_time = time.time() - build_start
+
+    snapshots = []
+    E.add_listener(snapshots.append)
+    E.evolve(n=10 ** 12, dom=50, sync=None, time_limit=time_limit, batch=batch, verbose=False)
+    return build_time, snapshots
+
+
+def run_scale(scale, time_limit=10, seed=0, batch=16, archive_size=500, flow_seeds=True):
+    """ Evolve one generated problem, returning its row of the benchmark table """
+    problem = Problem(*profiles_from_frames(*generate_scaled(scale, seed)))
+    build_time, snapshots = _evolve(problem, time_limit, seed, batch, archive_size, flow_seeds)
+    last = snapshots[-1]
+    return {"scale": scale,
+            "tas": problem.n_tas,
+            "sections": problem.n_sections,
+            "build_time": round(build_time, 3),
+            "evaluations": last["iteration"],
+            "evals_per_sec": round(last["iteration"] / last["elapsed"], 1),
+            "front_size": last["front_size"],
+            "hypervolume": last["quality"]["hypervolume"]}
+
+
+def benchmark(scales=(1, 10, 100), time_limit=10, seed=0, batch=16, archive_size=500, flow_seeds=True):
+    """ Benchmark table, one row per scale """
+    return pd.DataFrame([run_scale(scale, time_limit, seed, batch, archive_size, flow_seeds) for scale in scales])
+
+
+def _fronts_over_time(problem, time_limit, seed, batch, archive_size, flow_seeds, every=0.1):
+    """ Seeded run on problem, recording its front every so often: (hypervolume indicator,
+    [(elapsed seconds, front score matrix)]). The hypervolume is left for the caller to compute
+    after the run, and the time spent recording is taken off elapsed, so neither is timed """
+    E = build_evo(problem=problem, archive_size=archive_size, flow_seeds=flow_seeds, seed=seed)
+    indicator = E.indicators["hypervolume"]
+    E.indicators = {}
+
+    fronts = []
+    overhead = 0.0
+
+    def record(snap):
+        nonlocal overhead
+        start = time.time()
+        fronts.append((snap["elapsed"] - overhead, E.pop.scores()))
+        overhead += time.time() - start
+
+    E.add_listener(record)
+    E.evolve(n=10 ** 12, dom=50, sync=None, time_limit=time_limit, batch=batch, verbose=False,
+             snapshot_every=every)
+    return indicator, fronts
+
+
+def time_to_target(target=0.9, scale=1, seeds=range(5), time_limit=30, batch=16, archive_size=500,
+                   flow_seeds=False):
+    """ Seconds each seeded run takes to first reach hypervolume >= target (NaN if it never does),
+    all on the same generated problem. Only the optimizer's own time counts, not measuring it """
+    problem = Problem(*profiles_from_frames(*generate_scaled(scale, 0)))
+    rows = []
+    for seed in seeds:
+        indicator, fronts = _fronts_over_time(problem, time_limit, seed, batch, archive_size, flow_seeds)
+        quality = [(elapsed, indicator(scores)) for elapsed, scores in fronts]
+        reached = [elapsed for elapsed, hv in quality if hv >= target]
+        rows.append({"seed": seed,
+                     "seconds": round(reached[0], 3) if reached else np.nan,
+                     "final_hypervolume": round(quality[-1][1], 4)})
+    return pd.DataFrame(rows)
+
+
+def main(scales=(1, 10, 100), time_limit=10, target=0.9):
+    profiler.set_mode("off")  # measure the optimizer, not the profiler
+    results = benchmark(scales, time_limit)
+    print(results.to_string(index=False))
+    results.to_csv(get_output_path("benchmark.csv"), index=False)
+
+    times = time_to_target(target)
+    print(f"\nTime to hypervolume {target}:")
+    print(times.to_string(index=False))
+    print(f"median {times['seconds'].median():.2f}s, reached by {times['seconds'].notna().sum()} of {len(times)} seeds")
+    times.to_csv(get_output_path("time_to_target.csv"), index=False)
+
+
+if __name__ == "__main__":
+    main()
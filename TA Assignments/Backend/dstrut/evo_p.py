@@ -8,14 +8,16 @@ objectives
 
 """
 
-import random as rnd
 import copy
 import numpy as np
 import pandas as pd
-from functools import reduce
-import pickle
 import time
 import os
+from dstrut.archive import Archive
+from dstrut.store import SolutionStore
+from dstrut.scheduler import UniformScheduler
+
+COMPACT_FACTOR = 4  # compact the store once it holds this many records per population member
 
 def get_output_path(filename):
     """Return full path to backend/output/filename and create folder if needed."""
@@ -26,28 +28,174 @@ def get_output_path(filename):
 
 class Evo:
 
-    def __init__(self):
-        """ Constructor """
-        self.pop = {}  # scores (tuple) --> solution
+    def __init__(self, archive_size=None, eviction="crowding", epsilon=1, codec=None, seed=None):
+        """ Constructor
+        archive_size caps the population; once it is full the least diverse solutions
+        are evicted by crowding distance or, with eviction="epsilon", one per epsilon box
+        codec = (encode, decode) stores the population encoded, e.g. (packed.pack, packed.unpack)
+        seed fixes every random choice evolve makes (sampling parents, picking agents and,
+        for seeded agents, the agents' own choices): the same seed and number of agent
+        invocations give the same population. A time_limit cuts runs at varying points """
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)  # the one source of randomness
+        self.pop = Archive(archive_size, eviction, epsilon, codec=codec, rng=self.rng)  # scores (tuple) --> solution
         self.objectives = {}  # name --> obj function (goals)
         self.agents = {}  # agents: name -> (operator, num_solutions_input)
-
-    def add_objective(self, name, f):
-        """ Register an objective (fitness function) to the framework """
+        self.batched = set()  # names of objectives that can score a stacked batch
+        self.deltas = set()  # names of agents that report the cells they changed
+        self.seeded = set()  # names of agents that draw from our generator, op(solutions, rng=...)
+        self.make_tally = None  # solution --> tally, for incremental scoring
+        self.tallies = {}  # scores (tuple) --> (solution, tally)
+        self.store = None  # SolutionStore shared through sync()
+        self.stored = set()  # keys already in the store
+        self.scheduler = UniformScheduler(self.rng)  # picks the agents evolve runs
+        self.offspring = []  # (agent name, scores) added since the last remove_dominated
+        self.front = None  # score matrix of the population as of the last remove_dominated
+        self.listeners = []  # called with every progress snapshot taken during evolve
+        self.indicators = {}  # name --> front quality indicator reported in the snapshots
+
+    def add_objective(self, name, f, batched=False):
+        """ Register an objective (fitness function) to the framework
+        batched objectives also accept a stacked (N, ...) array of solutions
+        and return all N scores from a single call """
         self.objectives[name] = f
+        if batched:
+            self.batched.add(name)
 
-    def add_agent(self, name, op, k=1):
+    def add_agent(self, name, op, k=1, delta=False, seeded=False):
         """ Register a named agent with to the framework
         the operatr (op) defines what the agent does - how it changes the solution
-        the k value is the number of INPUT solutions from the current population """
+        the k value is the number of INPUT solutions from the current population
+        delta agents return (solution, cells): the cells they may have changed in
+        their first input, or None if the solution was built from scratch
+        seeded agents are called as op(solutions, rng=generator) and make their random
+        choices with it, so they are reproducible under the Evo's seed """
         self.agents[name] = (op, k)
+        if delta:
+            self.deltas.add(name)
+        if seeded:
+            self.seeded.add(name)
+
+    def _call(self, name, solutions):
+        """ Run agent name on its input solutions """
+        op, k = self.agents[name]
+        if name in self.seeded:
+            return op(solutions, rng=self.rng)
+        return op(solutions)
+
+    def reseed(self, seed):
+        """ Restart the random stream from seed (an int or a SeedSequence, e.g. from spawn) """
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self.pop.rng = self.rng
+        self.scheduler.rng = self.rng
+
+    def spawn(self, n):
+        """ n independent child seeds for parallel workers (e.g. islands): give one to each
+        worker's Evo.reseed and the workers' streams neither overlap nor depend on timing """
+        return self.seed_sequence.spawn(n)
+
+    def set_scheduler(self, scheduler):
+        """ Choose how evolve picks agents, e.g. scheduler.BanditScheduler() to favor
+        agents whose offspring keep entering the non-dominated front
+        The scheduler picks with the Evo's generator from then on """
+        scheduler.rng = self.rng
+        self.scheduler = scheduler
+
+    def add_listener(self, f):
+        """ Register f(snapshot) to receive the progress snapshots taken during evolve """
+        self.listeners.append(f)
+
+    def add_indicator(self, name, f):
+        """ Register a front quality indicator, f(score matrix) --> number, e.g. a
+        hypervolume (see dstrut.pareto). Every snapshot reports its value under "quality",
+        so listeners can follow how fast the front improves over wall-clock time """
+        self.indicators[name] = f
+
+    def snapshot(self, iteration, elapsed, evals_per_sec):
+        """ Progress snapshot: iteration, elapsed seconds, throughput, front size,
+        the best (lowest) score found so far on each objective and the quality indicators """
+        best = {}
+        for scores in self.pop.keys():
+            for name, score in scores:
+                if name not in best or score < best[name]:
+                    best[name] = score
+        snap = {"iteration": iteration,
+                "elapsed": round(elapsed, 3),
+                "evals_per_sec": round(evals_per_sec, 1),
+                "front_size": len(self.pop),
+                "best": {name: score.item() if isinstance(score, np.generic) else score
+                         for name, score in best.items()}}  # plain numbers, for JSON listeners
+        if self.indicators and len(self.pop):
+            scores = self.pop.scores()
+            snap["quality"] = {name: round(float(f(scores)), 4) for name, f in self.indicators.items()}
+        return snap
+
+    def _publish(self, iteration, elapsed, evals_per_sec):
+        if self.listeners:
+            snap = self.snapshot(iteration, elapsed, evals_per_sec)
+            for f in self.listeners:
+                f(snap)
+
+    def agent_stats(self):
+        """ Per agent credit: name --> {calls, kept, rate, weight} """
+        return self.scheduler.stats()
+
+    def set_tally(self, make_tally):
+        """ Enable incremental scoring of delta agents
+        make_tally(solution) builds a tally object with
+            update(parent, child, cells) --> tally of the child
+            scores() --> dict of objective name --> score
+        Each population member's tally is built once and reused by all of its children """
+        self.make_tally = make_tally
+        self.tallies = {}
+
+    @staticmethod
+    def _read_only(sol):
+        """ Hand a population member to an agent without copying it.
+        NumPy solutions come back as read-only views, so agents copy only when they build
+        their child (writing to the view raises instead of corrupting the population).
+        Anything else (e.g. the lists in sorting_p) is deep copied as before """
+        if isinstance(sol, np.ndarray):
+            view = sol.view()
+            view.flags.writeable = False
+            return view
+        return copy.deepcopy(sol)
 
     def get_random_solutions(self, k=1):
         if len(self.pop) == 0:
             return []
         else:
-            all_solutions = list(self.pop.values())
-            return [copy.deepcopy(rnd.choice(all_solutions)) for _ in range(k)]
+            if self.pop.decode:  # decoding already hands out a fresh copy
+                return [self.pop.sample() for _ in range(k)]
+            return [self._read_only(self.pop.sample()) for _ in range(k)]
+
+    def _tally_of(self, key):
+        """ Cached tally of the population member stored under key """
+        stored = self.pop.stored(key)
+        cached = self.tallies.get(key)
+        if cached is None or cached[0] is not stored:  # key was reused by another solution
+            cached = (stored, self.make_tally(self.pop[key]))
+            self.tallies[key] = cached
+        return cached[1]
+
+    def run_delta_agent(self, name):
+        """ Execute a named delta agent, scoring the child by updating its parent's tally """
+        op, k = self.agents[name]
+        picked = [self.pop.sample_key() for _ in range(k)] if len(self.pop) else []
+        parents = [self.pop[key] if self.pop.decode else self._read_only(self.pop[key]) for key in picked]
+        new_solution, cells = self._call(name, parents)
+
+        if cells is None or not picked:
+            tally = self.make_tally(new_solution)
+        else:
+            tally = self._tally_of(picked[0]).update(parents[0], new_solution, cells)
+
+        scores = tally.scores()
+        scores_tuple = tuple([(obj_name, scores[obj_name]) for obj_name in self.objectives])
+        self._add_offspring(name, scores_tuple, new_solution)
+        if scores_tuple in self.pop:  # not evicted straight away
+            self.tallies[scores_tuple] = (self.pop.stored(scores_tuple), tally)
 
     def add_solution(self, sol):
         """ Key: ((obj1, score1), (obj2, score2), ... (objn, scoren)) """
@@ -56,20 +204,89 @@ class Evo:
 
     def run_agent(self, name):
         """ Execute a named agent """
+        if name in self.deltas and self.make_tally is not None:
+            self.run_delta_agent(name)
+            return
+
         op, k = self.agents[name]
         picks = self.get_random_solutions(k)
-        new_solution = op(picks)
+        new_solution = self._call(name, picks)
+        if name in self.deltas:
+            new_solution, cells = new_solution
         scores = []
         for obj_name, f in self.objectives.items():
             try:
                 score = f(new_solution)
                 scores.append((obj_name, score))
             except Exception as e:
+                self.scheduler.reward(name, False)
                 return
 
         scores_tuple = tuple(scores)
 
-        self.pop[scores_tuple] = new_solution
+        self._add_offspring(name, scores_tuple, new_solution)
+
+    def _add_offspring(self, name, scores, sol):
+        """ Add an agent's offspring; it earns the agent credit at the next remove_dominated
+        if it found new scores that the front of the previous remove_dominated doesn't dominate
+        (even if a later offspring dominates it by then) """
+        if scores in self.pop:
+            self.scheduler.reward(name, False)
+        else:
+            self.offspring.append((name, scores))
+        self.pop[scores] = sol
+
+    def _score_columns(self, solutions):
+        """ One array of N scores per objective, stacking the solutions once for batched objectives """
+        columns = []
+        stacked = None
+        for name, f in self.objectives.items():
+            if name in self.batched:
+                if stacked is None:
+                    stacked = np.stack(solutions)
+                columns.append(np.asarray(f(stacked)))
+            else:
+                columns.append(np.array([f(sol) for sol in solutions]))
+        return columns
+
+    def evaluate(self, solutions):
+        """ Score N solutions at once, returning an (N, n_objectives) score matrix """
+        return np.column_stack(self._score_columns(solutions))
+
+    def run_agents(self, names):
+        """ Execute several named agents and score all of their offspring in one batch """
+        new_solutions = []
+        made_by = []
+        for name in names:
+            if name in self.deltas and self.make_tally is not None:
+                self.run_delta_agent(name)  # already cheaper than a batch slot
+                continue
+            op, k = self.agents[name]
+            new_solution = self._call(name, self.get_random_solutions(k))
+            if name in self.deltas:
+                new_solution, cells = new_solution
+            new_solutions.append(new_solution)
+            made_by.append(name)
+
+        if not new_solutions:
+            return
+
+        try:
+            columns = self._score_columns(new_solutions)
+        except Exception:
+            # one bad offspring shouldn't sink the batch: fall back to scoring one at a time
+            for name, new_solution in zip(made_by, new_solutions):
+                try:
+                    scores = tuple([(obj_name, f(new_solution)) for obj_name, f in self.objectives.items()])
+                except Exception:
+                    self.scheduler.reward(name, False)
+                    continue
+                self._add_offspring(name, scores, new_solution)
+            return
+
+        names = list(self.objectives.keys())
+        for name, scores, new_solution in zip(made_by, zip(*[column.tolist() for column in columns]), new_solutions):
+            self._add_offspring(name, tuple(zip(names, scores)), new_solution)
 
     @staticmethod
     def dominates(p, q):
@@ -83,51 +300,99 @@ class Evo:
         return S - {q for q in S if Evo.dominates(p, q)}
 
     def remove_dominated(self):
-        nds = reduce(Evo.reduce_nds, self.pop.keys(), self.pop.keys())
-        self.pop = {k: self.pop[k] for k in nds}
+        """ Drop every dominated solution from the population (and trim it to its size cap) """
+        # credit each agent whose offspring entered the front
+        if self.offspring:
+            entered = np.ones(len(self.offspring), dtype=bool)
+            if self.front is not None and len(self.front):
+                scores = np.array([[score for name, score in key] for name, key in self.offspring])
+                front = self.front[None, :, :]  # (1, f, k) against (m, 1, k)
+                dominated = (front <= scores[:, None, :]).all(axis=-1) & (front < scores[:, None, :]).any(axis=-1)
+                entered = ~dominated.any(axis=1)
+            for (name, key), kept in zip(self.offspring, entered.tolist()):
+                self.scheduler.reward(name, kept)
+            self.offspring = []
+
+        self.pop.trim()
+        self.tallies = {k: v for k, v in self.tallies.items() if k in self.pop}
+        self.front = self.pop.scores()
+
+    def sync(self, path="solutions.evo"):
+        """ Merge the population with the solution store at path (see dstrut.store)
+        Reads only what other runs appended since our last sync and appends only
+        our own new non-dominated solutions; compacts the file once it is mostly
+        dominated records. A store holding other objectives or matrix shapes is replaced """
+        if self.store is None or self.store.path != path:
+            self.store = SolutionStore(path)
+            self.stored = set()
+            if len(self.pop) and not self.store.fits(*next(iter(self.pop.items()))):
+                self.store.clear()  # left by a run on another problem: start a new one
+
+        for key, sol in self.store.read_new():
+            self.pop[key] = sol
+            self.stored.add(key)
+        self.remove_dominated()
+
+        new = [(key, sol) for key, sol in self.pop.items() if key not in self.stored]
+        self.store.append(new)
+        self.stored = {key for key in self.stored if key in self.pop}
+        self.stored.update(key for key, sol in new)
 
-    def evolve(self, n=1, dom=100, sync=1000, time_limit=None):
-        """ Run n invocations of agents with optional time limit (in seconds) """
+        if self.store.count() > COMPACT_FACTOR * max(len(self.pop), 100):
+            self.store.compact()
+
+    @staticmethod
+    def _due(i, b, every):
+        """ True if a multiple of every falls within the agent calls i .. i+b-1 """
+        return -(-i // every) * every < i + b
+
+    def evolve(self, n=1, dom=100, sync=1000, time_limit=None, batch=1, verbose=True, store="solutions.evo",
+               snapshot_every=1.0):
+        """ Run n invocations of agents with optional time limit (in seconds)
+        batch > 1 runs that many agents per step and scores their offspring together
+        every sync invocations the population is merged with the shared store file
+        (sync=None skips that), verbose=False skips the progress prints
+        listeners get a progress snapshot at most every snapshot_every seconds """
         start_time = time.time()
         agent_names = list(self.agents.keys())
+        last_snap, last_snap_i = start_time, 0
 
         i = 0
         while i < n:
             # Check time limit
             if time_limit and (time.time() - start_time) > time_limit:
-                print(f"Time limit of {time_limit}s reached after {i} iterations")
+                if verbose:
+                    print(f"Time limit of {time_limit}s reached after {i} iterations")
                 break
 
-            pick = rnd.choice(agent_names)
-            self.run_agent(pick)
-
-            if i % sync == 0:
-                # merge saved solutions into the population
-                try:
-                    with open('solutions.dat', 'rb') as file:
-                        loaded = pickle.load(file)
-                        for eval, sol in loaded.items():
-                            self.pop[eval] = sol
-                except Exception as e:
-                    pass  # File might not exist on first run
-
-                # removing dominated solutions
-                self.remove_dominated()
-
+            b = min(batch, n - i)
+            if b == 1:
+                pick = self.scheduler.pick(agent_names)[0]
+                self.run_agent(pick)
+            else:
+                self.run_agents(self.scheduler.pick(agent_names, b))
 
-                with open('solutions.dat', 'wb') as file:
-                    pickle.dump(self.pop, file)
+            if sync and self._due(i, b, sync):
+                self.sync(store)
 
-            if i % dom == 0:
+            if self._due(i, b, dom):
                 self.remove_dominated()
                 elapsed = time.time() - start_time
-                print(f"Generation {i}: Population size = {len(self.pop)}, Elapsed time = {elapsed:.1f}s")
+                if verbose:
+                    print(f"Generation {i}: Population size = {len(self.pop)}, Elapsed time = {elapsed:.1f}s")
+                now = start_time + elapsed
+                if now - last_snap >= snapshot_every:
+                    self._publish(i + b, elapsed, (i + b - last_snap_i) / (now - last_snap))
+                    last_snap, last_snap_i = now, i + b
 
-            i += 1
+            i += b
 
         self.remove_dominated()
         total_time = time.time() - start_time
-        print(f"Evolution completed in {total_time:.2f} seconds with {len(self.pop)} solutions")
+        now = start_time + total_time
+        self._publish(i, total_time, (i - last_snap_i) / (now - last_snap) if now > last_snap else 0.0)
+        if verbose:
+            print(f"Evolution completed in {total_time:.2f} seconds with {len(self.pop)} solutions")
 
     def summarize(self, group_name="AlexK"):
         """Convert population to summary table format for CSV output"""
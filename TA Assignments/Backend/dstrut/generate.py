@@ -0,0 +1,82 @@
+"""
+File: generate.py
+Description: Synthetic TA assignment problems at any size.
+
+Writes sections / TAs tables shaped like assignta_data/sections.csv and
+tas.csv, drawn from the same distributions as the real 40 TA x 17
+section term: 2-3 TAs needed per section, mostly single-section TAs,
+and about two thirds of the preferences "U" (unavailable). Timeslots
+grow with the number of sections, up to every slot of a five day week.
+
+"""
+
+import math
+import os
+import numpy as np
+import pandas as pd
+
+BASE_TAS = 40
+BASE_SECTIONS = 17
+DAYS = ["M", "T", "W", "R", "F"]
+TIMES = ["800-940", "950-1130", "1145-125", "135-315", "250-430", "440-630"]
+TOPICS = ["DS", "Health", "SocSci", "Business"]
+BUILDINGS = ["WVH", "KA", "RI", "SN"]
+MAX_ASSIGNED = ([1, 2, 3], [0.65, 0.33, 0.02])
+PREFERENCES = (["U", "W", "P"], [0.66, 0.21, 0.13])
+
+
+def generate(n_sections, n_tas, seed=None):
+    """ (sections, tas) DataFrames with the columns of sections.csv and tas.csv """
+    rng = np.random.default_rng(seed)
+    n_slots = min(len(DAYS) * len(TIMES), max(1, math.ceil(n_sections * 7 / BASE_SECTIONS)))
+    slots = [f"{day} {time}" for day in DAYS for time in TIMES]
+    slots = [slots[i] for i in sorted(rng.choice(len(slots), n_slots, replace=False))]
+
+    min_ta = rng.integers(2, 4, n_sections)
+    sections = pd.DataFrame({
+        "section": np.arange(n_sections),
+        "instructor": [f"Instructor {i}" for i in rng.integers(0, max(1, n_sections // 2), n_sections)],
+        "daytime": [slots[i] for i in rng.integers(0, n_slots, n_sections)],
+        "location": [f"{BUILDINGS[i % len(BUILDINGS)]} {100 + i}" for i in rng.integers(0, 400, n_sections)],
+        "students": rng.integers(15, 41, n_sections),
+        "topic": [TOPICS[i] for i in rng.integers(0, len(TOPICS), n_sections)],
+        "min_ta": min_ta,
+        "max_ta": min_ta + 1,
+    })
+
+    tas = pd.DataFrame({
+        "ta_id": np.arange(n_tas),
+        "name": [f"TA {i}" for i in range(n_tas)],
+        "max_assigned": rng.choice(MAX_ASSIGNED[0], n_tas, p=MAX_ASSIGNED[1]),
+    })
+    preferences = rng.choice(PREFERENCES[0], (n_tas, n_sections), p=PREFERENCES[1])
+    tas = pd.concat([tas, pd.DataFrame(preferences, columns=[str(j) for j in range(n_sections)])], axis=1)
+    return sections, tas
+
+
+def generate_scaled(scale, seed=None):
+    """ A problem scale times the size of the real one in both TAs and sections """
+    return generate(round(BASE_SECTIONS * scale), round(BASE_TAS * scale), seed)
+
+
+def write_instance(directory, scale, seed=None):
+    """ Write sections_{scale}x.csv and tas_{scale}x.csv to directory, returning their paths
+    (written to assignta_data they can be submitted as jobs by file name, see dstrut.jobs) """
+    sections, tas = generate_scaled(scale, seed)
+    os.makedirs(directory, exist_ok=True)
+    sections_file = os.path.join(directory, f"sections_{scale}x.csv")
+    tas_file = os.path.join(directory, f"tas_{scale}x.csv")
+    sections.to_csv(sections_file, index=False)
+    tas.to_csv(tas_file, index=False)
+    return sections_file, tas_file
+
+
+def main(scales=(10, 100), seed=0):
+    from dstrut.jobs import DATA_DIR
+    for scale in scales:
+        sections_file, tas_file = write_instance(DATA_DIR, scale, seed)
+        print(f"{scale}x: {sections_file}, {tas_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+File: islands.py
+Description: Island model for Evo.
+
+Several worker processes each evolve their own population (an "island").
+Every migrate_every seconds an island sends its non-dominated front to
+the master, which merges it into the global front and answers with a
+random sample of that front for the island to adopt. When time runs out
+the master returns an Evo holding the merged global front. The master's
+listeners get a progress snapshot of the merged front after every
+round (once every island has reported), counting the agent calls of all
+islands together and adding up their throughput, and its agent_stats add
+up the islands' agent credit.
+
+Each island counts its own profiler calls and sends them with its last
+front, and the master adds them to its own profiler.
+
+"""
+
+import math
+import multiprocessing as mp
+from multiprocessing.connection import wait
+import random as rnd
+import time
+import numpy as np
+from dstrut.profiler import profiler
+
+
+def _context():
+    """ Fork where the platform has it, so make_evo may be a closure or lambda.
+    Elsewhere make_evo has to be a picklable module level function """
+    if "fork" in mp.get_all_start_methods():
+        return mp.get_context("fork")
+    return mp.get_context()
+
+
+def _report(E, evaluations, epoch):
+    """ What an island tells the master besides its front: agent calls made so far,
+    its throughput over the last epoch and its scheduler's credit counts """
+    return {"evaluations": evaluations,
+            "rate": epoch["iteration"] / epoch["elapsed"] if epoch.get("elapsed") else 0.0,
+            "calls": dict(E.scheduler.calls),
+            "kept": dict(E.scheduler.kept)}
+
+
+def _island(make_evo, seed, conn, time_limit, migrate_every, dom, batch):
+    """ Worker: evolve one island, trading fronts with the master every epoch """
+    state = int(seed.generate_state(1)[0])  # forked islands would otherwise share the global random
+    rnd.seed(state)                         # state, which agents that aren't seeded still draw from
+    np.random.seed(state)
+    profiler.reset()  # a forked island starts with a copy of the master's counts
+    E = make_evo()
+    E.reseed(seed)
+    epoch = {}  # last progress snapshot of the current evolve call
+    E.add_listener(epoch.update)
+    evaluations = 0
+    deadline = time.time() + time_limit
+
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        E.evolve(n=math.inf, dom=dom, sync=None, time_limit=min(migrate_every, remaining),
+                 batch=batch, verbose=False)
+        evaluations += epoch["iteration"]
+        conn.send(("front", dict(E.pop.items()), _report(E, evaluations, epoch)))
+        for key, sol in conn.recv().items():
+            E.pop[key] = sol
+
+    conn.send(("done", dict(E.pop.items()), dict(_report(E, evaluations, epoch), profile=profiler.counts())))
+    conn.close()
+
+
+def run_islands(make_evo, islands=None, time_limit=60, migrate_every=5, migrants=10,
+                dom=100, batch=1, seed=None, listeners=()):
+    """ Evolve make_evo() populations on several processes and return the merged front
+
+    make_evo - builds a fully configured Evo (objectives, agents, seed solutions);
+               called once per island and once for the master
+    islands - number of worker processes (default: one per CPU)
+    time_limit - wall clock budget in seconds for every island
+    migrate_every - seconds between migrations
+    migrants - how many global front members each island receives per migration
+    dom, batch - passed through to Evo.evolve on the islands
+    seed - seeds the islands' random streams, spawned from one SeedSequence (default: random).
+           Migration depends on timing, so island runs are not reproducible step for step
+    listeners - registered on the master Evo (see Evo.add_listener), so they follow the merged front """
+    islands = islands or mp.cpu_count()
+    ctx = _context()
+
+    E = make_evo()
+    E.reseed(seed)
+    for f in listeners:
+        E.add_listener(f)
+    seeds = E.spawn(islands)
+    conns = []
+    workers = []
+    for i in range(islands):
+        parent_conn, child_conn = ctx.Pipe()
+        worker = ctx.Process(target=_island, daemon=True,
+                             args=(make_evo, seeds[i], child_conn, time_limit, migrate_every, dom, batch))
+        worker.start()
+        child_conn.close()
+        conns.append(parent_conn)
+        workers.append(worker)
+
+    start = time.time()
+    evaluations = [0] * islands  # agent calls made by each island so far
+    rates = [0.0] * islands  # each island's agent calls per second over its last epoch
+    credit = [({}, {}) for _ in range(islands)]  # (calls, kept) of each island's last report
+    active = list(conns)
+    waiting = set(active)  # islands yet to report in this migration round
+    published = None  # total agent calls in the last snapshot
+    while active:
+        for conn in wait(active):
+            try:
+                kind, front, report = conn.recv()
+            except EOFError:  # island died without saying goodbye
+                active.remove(conn)
+                waiting.discard(conn)
+                continue
+
+            i = conns.index(conn)
+            evaluations[i], rates[i] = report["evaluations"], report["rate"]
+            if "profile" in report:
+                profiler.merge(report["profile"])
+            calls, kept = credit[i]  # the island's counts are running totals: add what is new
+            E.scheduler.add_counts({name: n - calls.get(name, 0) for name, n in report["calls"].items()},
+                                   {name: n - kept.get(name, 0) for name, n in report["kept"].items()})
+            credit[i] = (report["calls"], report["kept"])
+
+            for key, sol in front.items():
+                E.pop[key] = sol
+            E.remove_dominated()
+
+            waiting.discard(conn)
+            if kind == "done":
+                active.remove(conn)
+            else:
+                picked = {}
+                for _ in range(min(migrants, len(E.pop))):
+                    key = E.pop.sample_key()
+                    picked[key] = E.pop[key]
+                conn.send(picked)
+
+            if not waiting and active:  # every island has reported: one snapshot per round
+                published = sum(evaluations)
+                E._publish(published, time.time() - start, sum(rates))
+                waiting = set(active)
+
+    if sum(evaluations) != published:  # the last reports didn't make a full round
+        E._publish(sum(evaluations), time.time() - start, sum(rates))
+    for worker in workers:
+        worker.join()
+    return E
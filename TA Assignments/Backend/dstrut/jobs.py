@@ -0,0 +1,129 @@
+"""
+File: jobs.py
+Description: Background optimization jobs for the Flask API.
+
+A JobManager owns a pool of worker processes. Each submitted job builds
+its own Problem and Evo (see assignta.build_evo), evolves for its time
+limit and returns the non-dominated front. While it runs, the job's
+latest progress snapshot is shared with the API process through a
+multiprocessing Manager dict, so several scheduling scenarios can be
+optimized at once and watched as they go.
+
+"""
+
+import multiprocessing as mp
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from dstrut.profiler import build_profiles, profiles_from_frames
+from dstrut.problem import Problem
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assignta_data")
+DEFAULT_SECTIONS = "sections.csv"
+DEFAULT_TAS = "tas.csv"
+MAX_TIME_LIMIT = 600  # seconds
+MAX_SEED = 2 ** 63  # seeds are non-negative and below this
+KEEP_FINISHED = 100  # finished jobs remembered; older ones are forgotten as new jobs come in
+
+
+def load_problem(spec=None):
+    """ Problem from a job's "problem" field:
+        None / {} - the default sections.csv and tas.csv
+        {"sections_file": ..., "tas_file": ...} - other CSV files in assignta_data
+        {"sections": [rows], "tas": [rows]} - inline rows shaped like the CSV files """
+    spec = spec or {}
+    if not isinstance(spec, dict):
+        raise TypeError("problem must be an object")
+    if "sections" in spec or "tas" in spec:
+        sections_df = pd.DataFrame(spec["sections"])
+        tas_df = pd.DataFrame(spec["tas"])
+        return Problem(*profiles_from_frames(sections_df, tas_df))
+    # only file names are accepted, so a request can't read files outside assignta_data
+    sections_file = os.path.join(DATA_DIR, os.path.basename(spec.get("sections_file", DEFAULT_SECTIONS)))
+    tas_file = os.path.join(DATA_DIR, os.path.basename(spec.get("tas_file", DEFAULT_TAS)))
+    return Problem(*build_profiles(sections_file, tas_file))
+
+
+def run_job(job_id, problem_spec, time_limit, seed, progress):
+    """ Worker process entry point: optimize one problem and return its front """
+    from dstrut.assignta import build_evo  # imported here so the API process doesn't need it
+
+    E = build_evo(problem=load_problem(problem_spec), seed=seed)
+    E.add_listener(lambda snap: progress.__setitem__(job_id, snap))
+    E.evolve(n=10 ** 12, dom=50, sync=None, time_limit=time_limit, batch=16, verbose=False)
+
+    return [{"scores": dict(scores), "solution": np.asarray(sol).tolist()}
+            for scores, sol in E.pop.items()]
+
+
+class JobManager:
+    """ Runs optimization jobs on a process pool and tracks their status """
+
+    def __init__(self, workers=None):
+        """ Constructor: workers defaults to one per CPU """
+        ctx = mp.get_context("spawn")  # the API process is multithreaded, so don't fork it
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+        self.manager = ctx.Manager()
+        self.progress = self.manager.dict()  # job id --> latest progress snapshot
+        self.jobs = {}  # job id --> {"future", "params", "submitted"}
+        self._lock = threading.Lock()  # submit is called from the API's request threads
+
+    def submit(self, problem=None, time_limit=15, seed=None):
+        """ Queue a job and return its id """
+        time_limit = float(time_limit)
+        if not 0 < time_limit <= MAX_TIME_LIMIT:
+            raise ValueError(f"time_limit must be between 0 and {MAX_TIME_LIMIT} seconds")
+        if seed is None:
+            seed = random.randrange(2 ** 31)
+        seed = int(seed)
+        if not 0 <= seed < MAX_SEED:
+            raise ValueError(f"seed must be between 0 and {MAX_SEED - 1}")
+        load_problem(problem)  # fail fast on a malformed problem, before it is queued
+
+        job_id = uuid.uuid4().hex
+        future = self.executor.submit(run_job, job_id, problem, time_limit, seed, self.progress)
+        with self._lock:
+            self._forget_finished()
+            self.jobs[job_id] = {"future": future,
+                                 "params": {"time_limit": time_limit, "seed": seed},
+                                 "submitted": time.time()}
+        return job_id
+
+    def _forget_finished(self):
+        """ Drop the oldest finished jobs (and their progress) beyond KEEP_FINISHED (call with the lock held) """
+        finished = [job_id for job_id, job in self.jobs.items() if job["future"].done()]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self.jobs[job_id]
+            self.progress.pop(job_id, None)
+
+    def status(self, job_id):
+        """ Status dict of a job, or None if the id is unknown """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        future = job["future"]
+        if future.done():
+            state = "failed" if future.exception() is not None else "done"
+        elif future.running():
+            state = "running"
+        else:
+            state = "queued"
+
+        result = {"id": job_id, "status": state, **job["params"],
+                  "submitted": job["submitted"], "progress": self.progress.get(job_id)}
+        if state == "failed":
+            result["error"] = repr(future.exception())
+        return result
+
+    def front(self, job_id):
+        """ The finished job's front: list of {"scores", "solution"} """
+        return self.jobs[job_id]["future"].result()
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+        self.manager.shutdown()
@@ -0,0 +1,110 @@
+"""
+File: packed.py
+Description: Bit-packed TA assignment solutions.
+
+A solution matrix holds one bit of information per cell, yet is stored as
+an int64 array. A PackedSolution keeps one uint32 word per TA instead,
+with bit j set when the TA is assigned to section j, so a 40x17 solution
+takes 160 bytes instead of 5,440. The objectives become bitwise ANDs and
+popcounts against per-TA masks taken from the Problem.
+
+"""
+
+import numpy as np
+
+WORD = np.uint32
+WORD_BITS = 32
+
+if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+    def popcount(words):
+        """ Number of set bits in each word """
+        return np.bitwise_count(words).astype(int)
+else:
+    # set bits of every 16 bit value; two lookups count a 32 bit word
+    _POPCOUNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.int64)
+
+    def popcount(words):
+        """ Number of set bits in each word """
+        words = np.asarray(words, dtype=WORD)
+        return _POPCOUNT16[words & WORD(0xFFFF)] + _POPCOUNT16[words >> WORD(16)]
+
+
+def pack_rows(matrix):
+    """ One word per row of a 0/1 matrix (or stacked batch of matrices), bit j = column j """
+    matrix = np.asarray(matrix)
+    if matrix.shape[-1] > WORD_BITS:
+        raise ValueError(f"Packed solutions hold at most {WORD_BITS} sections per TA")
+    weights = WORD(1) << np.arange(matrix.shape[-1], dtype=WORD)
+    return (matrix.astype(WORD) * weights).sum(axis=-1, dtype=WORD)
+
+
+def unpack_rows(words, n_cols):
+    """ 0/1 int matrix from one word per row """
+    bits = np.arange(n_cols, dtype=WORD)
+    return ((np.asarray(words, dtype=WORD)[..., None] >> bits) & WORD(1)).astype(int)
+
+
+class PackedSolution:
+    """ A TA assignment stored as one bit per cell """
+
+    __slots__ = ("rows", "n_sections")
+
+    def __init__(self, rows, n_sections):
+        """ Constructor: rows is one uint32 word per TA """
+        self.rows = rows
+        self.n_sections = n_sections
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        matrix = np.asarray(matrix)
+        return cls(pack_rows(matrix), matrix.shape[-1])
+
+    def to_matrix(self):
+        return unpack_rows(self.rows, self.n_sections)
+
+    @property
+    def shape(self):
+        return len(self.rows), self.n_sections
+
+    def copy(self):
+        """ A copy is a single small array copy, no generic deepcopy machinery """
+        return PackedSolution(self.rows.copy(), self.n_sections)
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def flip(self, ta, section):
+        self.rows[ta] ^= WORD(1) << WORD(section)
+
+    def __eq__(self, other):
+        return (isinstance(other, PackedSolution) and self.n_sections == other.n_sections
+                and np.array_equal(self.rows, other.rows))
+
+    # popcount based versions of the assignta objectives
+
+    def overallocation(self, problem):
+        return int(np.maximum(0, popcount(self.rows) - problem.max_assigned).sum())
+
+    def conflicts(self, problem):
+        per_timeslot = popcount(self.rows[:, None] & problem.timeslot_bits[None, :])
+        return int((per_timeslot > 1).any(axis=1).sum())
+
+    def undersupport(self, problem):
+        per_class = unpack_rows(self.rows, self.n_sections).sum(axis=0)
+        return int(np.maximum(0, problem.min_ta - per_class).sum())
+
+    def unavailable(self, problem):
+        return int(popcount(self.rows & problem.unavailable_bits).sum())
+
+    def unpreferred(self, problem):
+        return int(popcount(self.rows & problem.unpreferred_bits).sum())
+
+
+def pack(matrix):
+    """ Archive codec: matrix --> PackedSolution """
+    return PackedSolution.from_matrix(matrix)
+
+
+def unpack(packed):
+    """ Archive codec: PackedSolution --> fresh matrix """
+    return packed.to_matrix()
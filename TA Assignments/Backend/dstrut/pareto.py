@@ -0,0 +1,124 @@
+"""
+File: pareto.py
+Description: Vectorized Pareto filtering over a score matrix.
+
+All objectives are minimized. A row p dominates a row q when p is no
+worse than q on every objective and strictly better on at least one,
+the same rule as Evo.dominates.
+
+"""
+
+import numpy as np
+
+PAIRWISE_LIMIT = 1024  # above this many rows, switch to the sort based skyline filter
+CHUNK = 256  # rows compared against the whole matrix at once by the pairwise filter
+
+
+def pairwise_non_dominated(scores):
+    """ Boolean mask of the non-dominated rows of an (n, k) score matrix.
+    Compares every row against every other row, CHUNK rows at a time """
+    scores = np.asarray(scores)
+    keep = np.ones(len(scores), dtype=bool)
+    for start in range(0, len(scores), CHUNK):
+        block = scores[start:start + CHUNK, None, :]  # (b, 1, k) against (1, n, k)
+        no_worse = (scores[None, :, :] <= block).all(axis=-1)
+        better = (scores[None, :, :] < block).any(axis=-1)
+        keep[start:start + CHUNK] = ~(no_worse & better).any(axis=1)
+    return keep
+
+
+def skyline_non_dominated(scores):
+    """ Boolean mask of the non-dominated rows of an (n, k) score matrix.
+
+    Sort-filter-skyline: after a lexicographic sort no row can be dominated
+    by a row that comes after it, so each row only has to be checked
+    against the front found so far. Cost grows with n * front size rather
+    than n^2, which wins for big archives with a comparatively small front """
+    scores = np.asarray(scores)
+    keep = np.zeros(len(scores), dtype=bool)
+    front = np.empty_like(scores)
+    m = 0
+    for idx in np.lexsort(scores.T[::-1]):
+        row = scores[idx]
+        if m and ((front[:m] <= row).all(axis=1) & (front[:m] < row).any(axis=1)).any():
+            continue
+        front[m] = row
+        m += 1
+        keep[idx] = True
+    return keep
+
+
+def non_dominated(scores):
+    """ Boolean mask of the non-dominated rows, picking the cheaper filter for the size """
+    scores = np.asarray(scores)
+    if len(scores) <= PAIRWISE_LIMIT:
+        return pairwise_non_dominated(scores)
+    return skyline_non_dominated(scores)
+
+
+def crowding_distance(scores):
+    """ NSGA-II crowding distance of each row of an (n, k) score matrix.
+    Rows at either end of any objective get infinity so the extremes are never crowded out """
+    scores = np.asarray(scores, dtype=float)
+    n, k = scores.shape
+    distance = np.zeros(n)
+    if n <= 2:
+        distance[:] = np.inf
+        return distance
+
+    for j in range(k):
+        order = np.argsort(scores[:, j], kind="stable")
+        column = scores[order, j]
+        span = column[-1] - column[0]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        if span > 0:
+            distance[order[1:-1]] += (column[2:] - column[:-2]) / span
+    return distance
+
+
+def epsilon_representatives(scores, epsilon):
+    """ Indices of one row per epsilon box (the row nearest its box's lower corner).
+    The boxes are an epsilon wide grid laid over every objective """
+    scores = np.asarray(scores, dtype=float)
+    boxes = np.floor(scores / epsilon)
+    slack = (scores - boxes * epsilon).sum(axis=1)
+    order = np.lexsort(np.vstack([slack, boxes.T[::-1]]))
+    _, first = np.unique(boxes[order], axis=0, return_index=True)
+    return np.sort(order[first])
+
+
+def hypervolume(scores, ref, ideal=None, samples=100000, seed=0):
+    """ Volume of the objective space between ideal and ref that the rows of an (n, k) score
+    matrix dominate (the bigger, the better the front). Rows are clipped to the box, so one
+    past ref on any objective counts for nothing (but isn't an error).
+
+    Exact hypervolume is exponential in k, so this is a Monte Carlo estimate over a fixed seeded
+    sample: two fronts measured with the same seed see the same points, so a front that dominates
+    another never scores lower. ideal defaults to the origin (every objective is a penalty count) """
+    scores = np.atleast_2d(np.asarray(scores, dtype=float))
+    ref = np.asarray(ref, dtype=float)
+    ideal = np.zeros_like(ref) if ideal is None else np.asarray(ideal, dtype=float)
+    volume = float(np.prod(ref - ideal))
+    if len(scores) == 0 or volume <= 0:
+        return 0.0
+    front = np.clip(scores, ideal, ref)
+    front = front[non_dominated(front)]
+
+    points = ideal + np.random.default_rng(seed).random((samples, len(ref))) * (ref - ideal)
+    covered = 0
+    for start in range(0, samples, CHUNK * 16):
+        block = points[start:start + CHUNK * 16, None, :]  # (b, 1, k) against (1, m, k)
+        covered += int((front[None, :, :] <= block).all(axis=-1).any(axis=1).sum())
+    return volume * covered / samples
+
+
+def igd(scores, reference):
+    """ Inverted generational distance: mean distance from each row of a reference front
+    to the nearest row of scores. 0 when scores cover the whole reference front """
+    scores = np.atleast_2d(np.asarray(scores, dtype=float))
+    reference = np.atleast_2d(np.asarray(reference, dtype=float))
+    nearest = np.empty(len(reference))
+    for start in range(0, len(reference), CHUNK):
+        block = reference[start:start + CHUNK, None, :]
+        nearest[start:start + CHUNK] = np.sqrt(((scores[None, :, :] - block) ** 2).sum(axis=-1)).min(axis=1)
+    return float(nearest.mean())
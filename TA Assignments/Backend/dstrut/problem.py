@@ -0,0 +1,183 @@
+"""
+File: problem.py
+Description: A compiled, array based view of the TA assignment problem.
+
+build_profiles gives us lists of Section and TA objects, which are handy
+to read but slow to score against: every objective call had to walk the
+preferences dicts again. A Problem is built once per run and holds
+everything the objectives need as dense NumPy arrays.
+
+"""
+
+import numpy as np
+from dstrut.profiler import Section
+from dstrut.packed import WORD_BITS, pack_rows
+
+
+class Problem:
+    """ Dense NumPy encoding of the sections and TAs """
+
+    def __init__(self, sections=(), tas=()):
+        """ Constructor
+
+        sections - list of Section objects (from build_profiles)
+        tas - list of TA objects (from build_profiles)
+        Either list may be left empty when only half the problem is needed """
+        self.sections = list(sections)
+        self.tas = list(tas)
+
+        self.n_tas = len(self.tas)
+        if self.sections:
+            self.n_sections = len(self.sections)
+        else:
+            self.n_sections = max((int(s) + 1 for ta in self.tas for s in ta.preferences), default=0)
+
+        # per TA vectors / masks, shape (n_tas,) and (n_tas, n_sections)
+        self.max_assigned = np.array([ta.max_assigned for ta in self.tas], dtype=int)
+        self.unavailable = self._preference_mask('U')
+        self.unpreferred = self._preference_mask('W')
+
+        # per section vectors, shape (n_sections,)
+        self.min_ta = np.array([section.min_ta for section in self.sections], dtype=int)
+
+        # section x timeslot incidence, shape (n_sections, n_timeslots)
+        self.timeslots = sorted({section.daytime for section in self.sections})
+        slot_index = {daytime: i for i, daytime in enumerate(self.timeslots)}
+        self.incidence = np.zeros((len(self.sections), len(self.timeslots)), dtype=int)
+        for section_idx, section in enumerate(self.sections):
+            self.incidence[section_idx, slot_index[section.daytime]] = 1
+        self.slot_of = np.array([slot_index[section.daytime] for section in self.sections], dtype=int)
+        self._tables = None
+
+        # one uint32 word per TA / timeslot for PackedSolution scoring (only if the sections fit a word)
+        if self.n_sections <= WORD_BITS:
+            self.unavailable_bits = pack_rows(self.unavailable)
+            self.unpreferred_bits = pack_rows(self.unpreferred)
+            self.timeslot_bits = pack_rows(self.incidence.T)
+        else:
+            self.unavailable_bits = self.unpreferred_bits = self.timeslot_bits = None
+
+    def _preference_mask(self, code):
+        """ 0/1 matrix marking every (ta, section) cell with the given preference code """
+        mask = np.zeros((self.n_tas, self.n_sections), dtype=int)
+        for ta_idx, ta in enumerate(self.tas):
+            for section_id, preference in ta.preferences.items():
+                if preference == code:
+                    mask[ta_idx, int(section_id)] = 1
+        return mask
+
+    @property
+    def shape(self):
+        """ Shape of a solution matrix for this problem: (n_tas, n_sections) """
+        return self.n_tas, self.n_sections
+
+    def tables(self):
+        """ Lookup tables for the per-cell updates in Tally: plain python list copies of the
+        per TA / per section vectors (indexing a list is much cheaper than indexing a NumPy array
+        one scalar at a time), and one int8 (n_tas, n_sections) array of cell penalties, bit 0
+        unavailable and bit 1 unpreferred, read with .item (a list of lists that size would take
+        far longer to build and hundreds of MB at scale) """
+        if self._tables is None:
+            penalties = (self.unavailable + 2 * self.unpreferred).astype(np.int8)
+            self._tables = (self.max_assigned.tolist(), self.min_ta.tolist(), penalties, self.slot_of.tolist())
+        return self._tables
+
+
+class Tally:
+    """ Running per-TA / per-section counts behind the objective scores of one solution
+
+    Computing a Tally costs one full evaluation. After that, a child that
+    differs from its parent in a handful of cells can be scored by copying
+    the parent's Tally and updating it cell by cell, in O(cells changed) """
+
+    def __init__(self, problem, solution=None):
+        """ Constructor: tally a solution, or leave empty for copy() to fill in """
+        self.problem = problem
+        if solution is None:
+            return
+
+        per_timeslot = solution @ problem.incidence
+        self.assigned = solution.sum(axis=1).tolist()
+        self.per_class = solution.sum(axis=0).tolist()
+        self.per_timeslot = per_timeslot.tolist()
+        self.clashes = (per_timeslot > 1).sum(axis=1).tolist()  # timeslots double booked per TA
+
+        self.overallocation = int(np.maximum(0, solution.sum(axis=1) - problem.max_assigned).sum())
+        self.conflicts = sum(1 for c in self.clashes if c > 0)
+        self.undersupport = int(np.maximum(0, problem.min_ta - solution.sum(axis=0)).sum())
+        self.unavailable = int((solution * problem.unavailable).sum())
+        self.unpreferred = int((solution * problem.unpreferred).sum())
+
+    def copy(self):
+        """ Independent copy, cheap enough to make for every child """
+        tally = Tally(self.problem)
+        tally.assigned = self.assigned[:]
+        tally.per_class = self.per_class[:]
+        tally.per_timeslot = [row[:] for row in self.per_timeslot]
+        tally.clashes = self.clashes[:]
+        tally.overallocation = self.overallocation
+        tally.conflicts = self.conflicts
+        tally.undersupport = self.undersupport
+        tally.unavailable = self.unavailable
+        tally.unpreferred = self.unpreferred
+        return tally
+
+    def flip(self, ta, section, d):
+        """ Account for solution[ta, section] changing by d (+1 assigned, -1 removed) """
+        max_assigned, min_ta, penalties, slot_of = self.problem.tables()
+
+        before = self.assigned[ta]
+        self.assigned[ta] = before + d
+        self.overallocation += max(0, before + d - max_assigned[ta]) - max(0, before - max_assigned[ta])
+
+        before = self.per_class[section]
+        self.per_class[section] = before + d
+        self.undersupport += max(0, min_ta[section] - before - d) - max(0, min_ta[section] - before)
+
+        row = self.per_timeslot[ta]
+        slot = slot_of[section]
+        before = row[slot]
+        row[slot] = before + d
+        if before <= 1 < before + d:
+            self.clashes[ta] += 1
+            if self.clashes[ta] == 1:
+                self.conflicts += 1
+        elif before + d <= 1 < before:
+            self.clashes[ta] -= 1
+            if self.clashes[ta] == 0:
+                self.conflicts -= 1
+
+        penalty = penalties.item(ta, section)
+        if penalty:
+            self.unavailable += d * (penalty & 1)
+            self.unpreferred += d * (penalty >> 1)
+
+    def update(self, parent, child, cells):
+        """ Tally for child, given that it only differs from parent within cells """
+        tally = self.copy()
+        for ta, section in set(cells):
+            d = int(child[ta, section]) - int(parent[ta, section])
+            if d:
+                tally.flip(ta, section, d)
+        return tally
+
+    def scores(self):
+        """ Objective name --> score """
+        return {'overallocation': self.overallocation,
+                'conflicts': self.conflicts,
+                'undersupport': self.undersupport,
+                'unavailable': self.unavailable,
+                'unpreferred': self.unpreferred}
+
+
+def as_problem(data):
+    """ Return data as a Problem, compiling a raw Section or TA list if needed.
+
+    Lets the objectives keep accepting the build_profiles lists directly;
+    callers in a hot loop should compile once and pass the Problem instead """
+    if isinstance(data, Problem):
+        return data
+    data = list(data)
+    if data and isinstance(data[0], Section):
+        return Problem(sections=data)
+    return Problem(tas=data)
@@ -5,6 +5,10 @@ Enhanced with timing profiler functionality
 """
 
 import pandas as pd
+import numpy as np
+import json
+import os
+import random
 import time
 from functools import wraps
 from collections import defaultdict
@@ -29,14 +33,37 @@ class TA:
         self.preferences = preferences
 
 class Profiler:
-    """Simple profiler to track function calls and execution times"""
+    """Simple profiler to track function calls and execution times
 
-    def __init__(self):
+    Modes:
+        off     - decorated functions run untouched (if off when they are decorated,
+                  the decorator hands back the original function: zero cost)
+        sampled - every call is counted but only 1 in sample_every is timed
+        full    - every call is timed
+    The starting mode comes from the DSTRUT_PROFILE environment variable (default full)"""
+
+    MODES = ("off", "sampled", "full")
+
+    def __init__(self, mode=None, sample_every=100, max_samples=10000):
+        self.mode = None
+        self.set_mode(mode or os.environ.get("DSTRUT_PROFILE", "full"), sample_every)
+        self.max_samples = max_samples  # durations kept per function for the percentiles
         self.call_counts = defaultdict(int)
-        self.total_times = defaultdict(float)
+        self.timed_counts = defaultdict(int)
+        self.timed_ns = defaultdict(int)
+        self.samples = defaultdict(list)
+        self._rng = random.Random()  # private, so sampling never disturbs the global random state
         self.start_time = None
         self.end_time = None
 
+    def set_mode(self, mode, sample_every=None):
+        """Switch between off, sampled and full at runtime"""
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiler mode: {mode} (expected one of {self.MODES})")
+        self.mode = mode
+        if sample_every is not None:
+            self.sample_every = max(1, int(sample_every))
+
     def start_profiling(self):
         """Start the overall timing"""
         self.start_time = time.time()
@@ -53,38 +80,119 @@ class Profiler:
             return self.end_time - self.start_time
         return 0
 
+    def reset(self):
+        """Forget every count and sample (in place: decorated functions hold on to the counters)"""
+        for counter in (self.call_counts, self.timed_counts, self.timed_ns, self.samples):
+            counter.clear()
+
+    def counts(self):
+        """The counters as plain dicts, e.g. to send from a worker process to merge"""
+        return {"calls": dict(self.call_counts), "timed": dict(self.timed_counts),
+                "ns": dict(self.timed_ns), "samples": {name: list(v) for name, v in self.samples.items()}}
+
+    def merge(self, counts):
+        """Add the counters of another profiler (from counts()), keeping at most max_samples durations"""
+        for name, n in counts["calls"].items():
+            self.call_counts[name] += n
+        for name, n in counts["timed"].items():
+            self.timed_counts[name] += n
+        for name, ns in counts["ns"].items():
+            self.timed_ns[name] += ns
+        for name, samples in counts["samples"].items():
+            merged = self.samples[name] + samples
+            if len(merged) > self.max_samples:
+                merged = self._rng.sample(merged, self.max_samples)
+            self.samples[name] = merged
+
+    def record(self, func_name, elapsed_ns):
+        """Add one timed call, keeping a bounded reservoir sample of durations"""
+        self.timed_counts[func_name] += 1
+        self.timed_ns[func_name] += elapsed_ns
+        samples = self.samples[func_name]
+        if len(samples) < self.max_samples:
+            samples.append(elapsed_ns)
+        else:
+            j = self._rng.randrange(self.timed_counts[func_name])
+            if j < self.max_samples:
+                samples[j] = elapsed_ns
+
     def profile(self, func):
         """Decorator to profile a function"""
+        if self.mode == "off":
+            return func
+
+        func_name = func.__name__
+        call_counts = self.call_counts
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start = time.time()
-            result = func(*args, **kwargs)
-            end = time.time()
-
-            func_name = func.__name__
-            self.call_counts[func_name] += 1
-            self.total_times[func_name] += (end - start)
+            mode = self.mode
+            if mode == "off":
+                return func(*args, **kwargs)
+            call_counts[func_name] += 1
+            if mode == "sampled" and call_counts[func_name] % self.sample_every:
+                return func(*args, **kwargs)
 
+            start = time.perf_counter_ns()
+            result = func(*args, **kwargs)
+            self.record(func_name, time.perf_counter_ns() - start)
             return result
         return wrapper
 
+    def total_time(self, func_name):
+        """Total seconds spent in func_name (scaled up from the timed calls when sampling)"""
+        timed = self.timed_counts[func_name]
+        if timed == 0:
+            return 0.0
+        return self.timed_ns[func_name] / timed * self.call_counts[func_name] / 1e9
+
+    def percentiles(self, func_name, qs=(50, 95, 99)):
+        """Call duration percentiles in seconds"""
+        samples = self.samples[func_name]
+        if not samples:
+            return [0.0 for _ in qs]
+        return [float(v) / 1e9 for v in np.percentile(samples, qs)]
+
+    def records(self):
+        """One dict per profiled function, for JSON / CSV output"""
+        keys = ["function", "calls", "total_time", "avg_time", "p50", "p95", "p99"]
+        return [dict(zip(keys, row)) for row in self._rows()]
+
+    def summary(self):
+        """The whole report as a JSON-ready dict"""
+        return {"total_time": round(self.get_total_time(), 4),
+                "mode": self.mode,
+                "sample_every": self.sample_every,
+                "functions": self.records()}
+
+    def _rows(self):
+        """(name, calls, total, avg, p50, p95, p99) per profiled function"""
+        rows = []
+        for func_name in sorted(self.call_counts.keys()):
+            calls = self.call_counts[func_name]
+            total_time = self.total_time(func_name)
+            avg_time = total_time / calls if calls > 0 else 0
+            rows.append((func_name, calls, total_time, avg_time, *self.percentiles(func_name)))
+        return rows
+
+    def _mode_label(self):
+        if self.mode == "sampled":
+            return f"sampled 1/{self.sample_every}"
+        return self.mode
+
     def report(self):
         """Generate profiling report"""
         print("\n" + "="*50)
         print("PROFILING REPORT")
         print("="*50)
-        print(f"Total execution time: {self.get_total_time():.2f} seconds")
+        print(f"Total execution time: {self.get_total_time():.2f} seconds (profiler: {self._mode_label()})")
         print(f"Time limit check: {'PASS' if self.get_total_time() <= 300 else 'FAIL'} (limit: 300s)")
         print()
-        print(f"{'Function':<25} {'Calls':<10} {'Total Time':<12} {'Avg Time':<12}")
-        print("-" * 60)
-
-        for func_name in sorted(self.call_counts.keys()):
-            calls = self.call_counts[func_name]
-            total_time = self.total_times[func_name]
-            avg_time = total_time / calls if calls > 0 else 0
+        print(f"{'Function':<25} {'Calls':<10} {'Total Time':<12} {'Avg Time':<12} {'p50':<10} {'p95':<10} {'p99':<10}")
+        print("-" * 93)
 
-            print(f"{func_name:<25} {calls:<10} {total_time:<12.4f} {avg_time:<12.6f}")
+        for row in self._rows():
+            print("{:<25} {:<10} {:<12.4f} {:<12.6f} {:<10.6f} {:<10.6f} {:<10.6f}".format(*row))
 
         print("="*50)
         return self.get_report_string()
@@ -92,16 +200,12 @@ class Profiler:
     def get_report_string(self):
         """Get report as string for saving to file"""
         report = []
-        report.append(f"Total execution time: {self.get_total_time():.2f} seconds")
+        report.append(f"Total execution time: {self.get_total_time():.2f} seconds (profiler: {self._mode_label()})")
         report.append("")
-        report.append(f"{'Function':<25} {'Calls':<10} {'Total Time':<12} {'Avg Time':<12}")
-
-        for func_name in sorted(self.call_counts.keys()):
-            calls = self.call_counts[func_name]
-            total_time = self.total_times[func_name]
-            avg_time = total_time / calls if calls > 0 else 0
+        report.append(f"{'Function':<25} {'Calls':<10} {'Total Time':<12} {'Avg Time':<12} {'p50':<10} {'p95':<10} {'p99':<10}")
 
-            report.append(f"{func_name:<25} {calls:<10} {total_time:<12.4f} {avg_time:<12.6f}")
+        for row in self._rows():
+            report.append("{:<25} {:<10} {:<12.4f} {:<12.6f} {:<10.6f} {:<10.6f} {:<10.6f}".format(*row))
         return "\n".join(report)
 
     def save_report(self, filename):
@@ -110,22 +214,43 @@ class Profiler:
         with open(filepath, 'w') as f:
             f.write(self.get_report_string())
 
+    def save_json(self, filename):
+        """Save the report as JSON"""
+        with open(get_output_path(filename), 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def save_csv(self, filename):
+        """Save the per-function rows as CSV"""
+        columns = ["function", "calls", "total_time", "avg_time", "p50", "p95", "p99"]
+        pd.DataFrame(self.records(), columns=columns).to_csv(get_output_path(filename), index=False)
+
+
+class MetricsLog:
+    """Evo listener that streams progress snapshots to a JSON lines file in the output folder
+
+    Each line is one Evo snapshot plus the time spent so far in every profiled
+    function, so a reader can follow throughput, front size and per-objective cost
+    while the run is still going"""
+
+    def __init__(self, filename, profiler=None):
+        self.path = get_output_path(filename)
+        self.profiler = profiler
+        self.snapshots = []
+        open(self.path, 'w').close()  # a new run starts a new series
+
+    def __call__(self, snapshot):
+        if self.profiler is not None:
+            snapshot = dict(snapshot, cost={name: round(self.profiler.total_time(name), 4)
+                                            for name in self.profiler.call_counts})
+        self.snapshots.append(snapshot)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(snapshot) + "\n")
+
 profiler = Profiler()
 
 def profile(func):
     """Decorator function that uses the global profiler instance"""
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start = time.time()
-        result = func(*args, **kwargs)
-        end = time.time()
-
-        func_name = func.__name__
-        profiler.call_counts[func_name] += 1
-        profiler.total_times[func_name] += (end - start)
-
-        return result
-    return wrapper
+    return profiler.profile(func)
 
 def load_data(section_directory, ta_directory):
     section = pd.read_csv(section_directory)
@@ -134,7 +259,10 @@ def load_data(section_directory, ta_directory):
 
 def build_profiles(section_directory, ta_directory):
     sections_df, tas_df = load_data(section_directory, ta_directory)
+    return profiles_from_frames(sections_df, tas_df)
 
+def profiles_from_frames(sections_df, tas_df):
+    """Section and TA objects from DataFrames shaped like sections.csv and tas.csv"""
     sections = [
         Section(row['section'], row['instructor'], row['daytime'], row['location'],
                 row['students'], row['topic'], row['min_ta'], row['max_ta'])
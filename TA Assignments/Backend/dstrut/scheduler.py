@@ -0,0 +1,147 @@
+"""
+File: scheduler.py
+Description: Agent schedulers for Evo.evolve.
+
+A scheduler decides which agents run next and keeps per-agent credit
+statistics. An agent earns credit when its offspring enters the front:
+no member of the front as of the previous remove_dominated pass
+dominates it (see Evo.remove_dominated).
+
+UniformScheduler picks agents uniformly at random, like evolve always did.
+BanditScheduler treats the agents as arms of a multi-armed bandit and
+uses Thompson sampling over each agent's counts of offspring kept and
+produced: every pick draws a plausible success rate for each agent from
+its Beta posterior and runs the agent with the highest draw, so agents
+that never succeed are soon left out while rarely tried ones still get a
+chance. A floor keeps every agent in the mix, so one that becomes useful
+later can still catch up; a discount below 1 also fades the old counts,
+but once the front settles only about one offspring in a thousand enters
+it, so forgetting quickly leaves too few successes to tell agents apart.
+
+"""
+
+import numpy as np
+
+
+class UniformScheduler:
+    """ Uniform random agent selection, with credit statistics """
+
+    def __init__(self, rng=None):
+        """ Constructor: rng is the numpy Generator to pick with (Evo.set_scheduler hands over its own) """
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.calls = {}  # name --> offspring produced
+        self.kept = {}  # name --> offspring that entered the front
+
+    def _register(self, names):
+        for name in names:
+            if name not in self.calls:
+                self.calls[name] = 0
+                self.kept[name] = 0
+
+    def weights(self, names):
+        """ Relative probability of picking each agent """
+        return [1.0] * len(names)
+
+    def pick(self, names, k=1):
+        """ k agent names to run next """
+        self._register(names)
+        if k == 1:
+            return [names[int(self.rng.random() * len(names))]]
+        return [names[i] for i in self.rng.integers(len(names), size=k)]
+
+    def reward(self, name, kept):
+        """ Credit one offspring of name: kept is True if it entered the front """
+        self._register([name])
+        self.calls[name] += 1
+        if kept:
+            self.kept[name] += 1
+
+    def add_counts(self, calls, kept):
+        """ Add credit counted elsewhere, e.g. on island workers: name --> count dicts """
+        self._register(calls)
+        for name, n in calls.items():
+            self.calls[name] += n
+            self.kept[name] += kept.get(name, 0)
+
+    def stats(self):
+        """ name --> {calls, kept, rate, weight} """
+        names = list(self.calls)
+        weights = self.weights(names)
+        total = sum(weights) or 1
+        return {name: {"calls": self.calls[name],
+                       "kept": self.kept[name],
+                       "rate": self.kept[name] / self.calls[name] if self.calls[name] else 0.0,
+                       "weight": weight / total}
+                for name, weight in zip(names, weights)}
+
+
+class BanditScheduler(UniformScheduler):
+    """ Thompson sampling over the agents' recent kept / produced counts """
+
+    def __init__(self, discount=1.0, p_min=None, rng=None):
+        """ Constructor
+
+        discount - every credited offspring scales all earlier counts by this much
+                   (1 keeps them all; 0.999 remembers about the last thousand offspring)
+        p_min - smallest selection probability of any agent
+                (default: a quarter of the uniform probability)
+        rng - numpy Generator to pick with """
+        super().__init__(rng)
+        self.discount = discount
+        self.p_min = p_min
+        self.index = {}  # name --> position in the count arrays
+        self.successes = np.zeros(0)  # discounted offspring kept, per agent
+        self.failures = np.zeros(0)  # discounted offspring not kept, per agent
+
+    def _register(self, names):
+        super()._register(names)
+        for name in names:
+            if name not in self.index:
+                self.index[name] = len(self.index)
+                self.successes = np.append(self.successes, 0.0)
+                self.failures = np.append(self.failures, 0.0)
+
+    def _p_min(self, n):
+        p_min = self.p_min if self.p_min is not None else 0.25 / n
+        return min(p_min, 1.0 / n)
+
+    def _draw(self, names, k, rng):
+        """ Indices into names of k picks """
+        n = len(names)
+        idx = [self.index[name] for name in names]
+        # Beta(1, 1) prior: an agent without offspring yet is as likely to be good as bad
+        draws = rng.beta(1 + self.successes[idx], 1 + self.failures[idx], size=(k, n))
+        picks = draws.argmax(axis=1)
+        uniform = rng.random(k) < n * self._p_min(n)
+        picks[uniform] = rng.integers(n, size=int(uniform.sum()))
+        return picks
+
+    def weights(self, names):
+        """ Selection probability of each agent, estimated from draws of a separate generator
+        (so asking doesn't change the picks) """
+        n = len(names)
+        if n == 0:
+            return []
+        self._register(names)
+        picks = self._draw(names, 4000, np.random.default_rng(0))
+        return (np.bincount(picks, minlength=n) / len(picks)).tolist()
+
+    def pick(self, names, k=1):
+        self._register(names)
+        return [names[i] for i in self._draw(names, k, self.rng)]
+
+    def reward(self, name, kept):
+        super().reward(name, kept)
+        if self.discount != 1:
+            self.successes *= self.discount
+            self.failures *= self.discount
+        if kept:
+            self.successes[self.index[name]] += 1
+        else:
+            self.failures[self.index[name]] += 1
+
+    def add_counts(self, calls, kept):
+        super().add_counts(calls, kept)
+        for name, n in calls.items():
+            self.successes[self.index[name]] += kept.get(name, 0)
+            self.failures[self.index[name]] += n - kept.get(name, 0)
@@ -0,0 +1,187 @@
+"""
+File: seeding.py
+Description: Good starting solutions for assignta from a min-cost flow.
+
+Assigning TAs to sections is close to a capacitated assignment problem,
+which min-cost flow solves exactly:
+
+    source --> TA           capacity max_assigned (no overallocation)
+    TA --> (TA, timeslot)   capacity 1 (no two sections in one timeslot)
+    (TA, timeslot) --> section   capacity 1, cost by preference
+    section --> sink        capacity min_ta (every section supported)
+
+The maximum flow covers as many of the sections' TA slots as the
+constraints allow, and its minimum cost keeps unpreferred ("W")
+assignments to a minimum. Relaxing one constraint at a time (letting
+"U" assignments or extra sections per TA in at a price) trades it for
+more coverage, so the seeds land on different corners of the front
+instead of Evo starting from random matrices.
+
+"""
+
+import heapq
+import numpy as np
+
+RELAXED = 1000  # cost of a relaxed assignment: only used when nothing else covers a section
+
+
+class FlowNetwork:
+    """ Min-cost max flow by the primal-dual method
+
+    Each phase finds shortest path distances with Dijkstra (on costs reduced by
+    node potentials, so they stay non-negative), then pushes a blocking flow
+    through every shortest path at once, Dinic style. The assignment costs take
+    only a few distinct values, so a handful of phases push the whole flow
+    instead of one Dijkstra per unit of flow """
+
+    def __init__(self, n):
+        """ Constructor: n nodes, numbered 0 .. n-1 """
+        self.n = n
+        self.edges = [[] for _ in range(n)]  # node --> [to, capacity, cost, index of reverse edge]
+
+    def add_edge(self, u, v, capacity, cost):
+        """ Add an edge u --> v, returning its handle for flow() """
+        self.edges[u].append([v, capacity, cost, len(self.edges[v])])
+        self.edges[v].append([u, 0, -cost, len(self.edges[u]) - 1])
+        return u, len(self.edges[u]) - 1
+
+    def flow(self, handle):
+        """ Flow through an edge after min_cost_flow """
+        u, i = handle
+        v, capacity, cost, rev = self.edges[u][i]
+        return self.edges[v][rev][1]
+
+    def _distances(self, source, potential):
+        """ Dijkstra over the residual edges, with reduced costs """
+        dist = [None] * self.n
+        dist[source] = 0
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, capacity, cost, rev in self.edges[u]:
+                if capacity > 0:
+                    nd = d + cost + potential[u] - potential[v]
+                    if dist[v] is None or nd < dist[v]:
+                        dist[v] = nd
+                        heapq.heappush(heap, (nd, v))
+        return dist
+
+    def _blocking_flow(self, source, sink, potential):
+        """ Push flow along shortest paths only (residual edges of reduced cost 0), returning the amount """
+        def admissible(u, edge):
+            return edge[1] > 0 and edge[2] + potential[u] - potential[edge[0]] == 0
+
+        pushed = 0
+        while True:
+            level = [None] * self.n  # BFS depth in the admissible graph
+            level[source] = 0
+            queue = [source]
+            for u in queue:
+                for edge in self.edges[u]:
+                    if level[edge[0]] is None and admissible(u, edge):
+                        level[edge[0]] = level[u] + 1
+                        queue.append(edge[0])
+            if level[sink] is None:
+                return pushed
+
+            current = [0] * self.n  # next edge to try from each node
+            while True:
+                path = []  # (node, edge) pairs from source
+                u = source
+                while u != sink:
+                    edges = self.edges[u]
+                    while current[u] < len(edges):
+                        edge = edges[current[u]]
+                        if level[edge[0]] == level[u] + 1 and admissible(u, edge):
+                            break
+                        current[u] += 1
+                    if current[u] == len(edges):  # dead end: retreat
+                        if not path:
+                            break
+                        u, edge = path.pop()
+                        current[u] += 1
+                        continue
+                    path.append((u, edge))
+                    u = edge[0]
+                if u != sink:
+                    break
+                push = min(edge[1] for u, edge in path)
+                for u, edge in path:
+                    edge[1] -= push
+                    self.edges[edge[0]][edge[3]][1] += push
+                pushed += push
+
+    def min_cost_flow(self, source, sink):
+        """ Push the maximum flow from source to sink at minimum cost (costs must be >= 0)
+        Returns the amount of flow """
+        potential = [0] * self.n
+        total = 0
+        while True:
+            dist = self._distances(source, potential)
+            if dist[sink] is None:
+                return total
+            # unreachable nodes move with the sink, keeping every reduced cost non-negative
+            potential = [p + (dist[sink] if d is None else min(d, dist[sink])) for p, d in zip(potential, dist)]
+            total += self._blocking_flow(source, sink, potential)
+
+
+def flow_seed(problem, unavailable=False, overallocate=False, unpreferred=True):
+    """ Solution matrix from a min-cost flow over problem (a dstrut.problem.Problem)
+
+    unavailable - allow "U" assignments at a high price, when they are the only way to support a section
+    overallocate - allow TAs extra sections at a high price, for the same reason
+    unpreferred - allow "W" assignments (at a small price); False keeps to preferred sections only """
+    n_tas, n_sections = problem.shape
+    n_slots = len(problem.timeslots)
+    source, sink = 0, 1
+    ta_node = 2
+    slot_node = ta_node + n_tas  # node of (ta, slot) = slot_node + ta * n_slots + slot
+    section_node = slot_node + n_tas * n_slots
+    net = FlowNetwork(section_node + n_sections)
+
+    for ta in range(n_tas):
+        net.add_edge(source, ta_node + ta, int(problem.max_assigned[ta]), 0)
+        if overallocate:
+            net.add_edge(source, ta_node + ta, n_sections, RELAXED)
+        for slot in range(n_slots):
+            net.add_edge(ta_node + ta, slot_node + ta * n_slots + slot, 1, 0)
+
+    handles = {}
+    for ta in range(n_tas):
+        for section in range(n_sections):
+            if problem.unavailable[ta, section]:
+                if not unavailable:
+                    continue
+                cost = RELAXED
+            elif problem.unpreferred[ta, section]:
+                if not unpreferred:
+                    continue
+                cost = 1
+            else:
+                cost = 0
+            slot = slot_node + ta * n_slots + problem.slot_of[section]
+            handles[ta, section] = net.add_edge(slot, section_node + section, 1, cost)
+
+    for section in range(n_sections):
+        net.add_edge(section_node + section, sink, int(problem.min_ta[section]), 0)
+
+    net.min_cost_flow(source, sink)
+    solution = np.zeros(problem.shape, dtype=np.int8)
+    for (ta, section), handle in handles.items():
+        solution[ta, section] = net.flow(handle)
+    return solution
+
+
+def seed_solutions(problem):
+    """ Distinct flow seeds, one per combination of relaxed constraints
+    (relaxing is skipped when the strict flow already supports every section) """
+    seeds = [flow_seed(problem), flow_seed(problem, unpreferred=False)]
+    if (seeds[0].sum(axis=0) >= problem.min_ta).all():
+        return seeds if not (seeds[0] == seeds[1]).all() else seeds[:1]
+    for options in ({"unavailable": True}, {"overallocate": True}, {"unavailable": True, "overallocate": True}):
+        solution = flow_seed(problem, **options)
+        if not any((solution == seed).all() for seed in seeds):
+            seeds.append(solution)
+    return seeds
@@ -46,7 +46,7 @@ def main():
     E.add_solution(L)
     print(E)
 
-    E.evolve(n=10**100, dom=100)
+    E.evolve(n=10**100, dom=100, sync=None)  # the solution store only holds 0/1 matrices
     print(E)
 
 
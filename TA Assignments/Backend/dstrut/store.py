@@ -0,0 +1,228 @@
+"""
+File: store.py
+Description: A compact, append-only file of scored 0/1 solution matrices.
+
+Replaces pickling the whole population to solutions.dat on every sync.
+
+Layout:
+    header  - magic, version, score dtype, number of objectives, matrix
+              shape and the objective names
+    records - one per solution: the scores, then the matrix bit-packed
+              row by row (a 40x17 matrix takes 85 bytes)
+
+Writers append whole records under an exclusive lock and compaction
+rewrites the file through an atomic rename, so several processes can
+share one store. Readers remember how far they have read, and merge only
+the records appended since their last read; a store that had read up to
+the end before appending skips past its own records.
+
+"""
+
+import os
+import struct
+from contextlib import contextmanager
+import numpy as np
+from dstrut.pareto import non_dominated
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks on Windows; appends and renames are still whole-record
+    fcntl = None
+
+MAGIC = b"EVOSTORE"
+VERSION = 1
+HEADER = struct.Struct("<8sBcHHH")  # magic, version, score dtype code, k, rows, cols
+NAME_LEN = struct.Struct("<H")
+
+
+class SolutionStore:
+
+    def __init__(self, path, dtype=np.int8):
+        """ Constructor: nothing is read or written until the first call
+        dtype is the type of the solutions read back (int8 like the assignta agents make) """
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.lock_path = path + ".lock"
+        self.names = None  # objective names, in score order
+        self.shape = None  # (rows, cols) of every solution
+        self.score_dtype = None  # "<i8" or "<f8"
+        self._record = None  # numpy dtype of one record
+        self._inode = None  # inode of the file we have been reading
+        self._offset = 0  # bytes of that file already read
+
+    @contextmanager
+    def _locked(self, exclusive):
+        """ Hold a lock on the side file path.lock (the data file itself gets renamed over) """
+        with open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _set_layout(self, names, shape, score_dtype):
+        self.names = list(names)
+        self.shape = tuple(shape)
+        self.score_dtype = score_dtype
+        nbytes = -(-self.shape[0] * self.shape[1] // 8)
+        self._record = np.dtype([("scores", score_dtype, (len(self.names),)), ("bits", "u1", (nbytes,))])
+
+    def _header(self):
+        code = b"i" if self.score_dtype == "<i8" else b"f"
+        parts = [HEADER.pack(MAGIC, VERSION, code, len(self.names), *self.shape)]
+        for name in self.names:
+            encoded = name.encode("utf-8")
+            parts.append(NAME_LEN.pack(len(encoded)) + encoded)
+        return b"".join(parts)
+
+    def _read_header(self, f):
+        """ Parse the header of an open store file, returning its length in bytes """
+        raw = f.read(HEADER.size)
+        if len(raw) < HEADER.size:
+            raise ValueError(f"{self.path} is not a solution store (too short)")
+        magic, version, code, k, rows, cols = HEADER.unpack(raw)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} solution store")
+        names = []
+        for _ in range(k):
+            (length,) = NAME_LEN.unpack(f.read(NAME_LEN.size))
+            names.append(f.read(length).decode("utf-8"))
+        self._set_layout(names, (rows, cols), "<i8" if code == b"i" else "<f8")
+        return f.tell()
+
+    def _encode(self, items):
+        """ Records for (scores tuple, solution) pairs """
+        records = np.zeros(len(items), dtype=self._record)
+        for i, (key, sol) in enumerate(items):
+            if [name for name, score in key] != self.names:
+                raise ValueError(f"Scores {key} don't match the store's objectives {self.names}")
+            sol = np.asarray(sol)
+            if sol.shape != self.shape or not ((sol == 0) | (sol == 1)).all():
+                raise ValueError(f"The store holds 0/1 matrices of shape {self.shape}")
+            records[i]["scores"] = [score for name, score in key]
+            records[i]["bits"] = np.packbits(sol.astype(np.uint8).reshape(-1))
+        return records.tobytes()
+
+    def _decode(self, data):
+        """ (scores tuple, solution) pairs from whole records """
+        records = np.frombuffer(data, dtype=self._record)
+        rows, cols = self.shape
+        items = []
+        for scores, bits in zip(records["scores"].tolist(), records["bits"]):
+            sol = np.unpackbits(bits, count=rows * cols).reshape(rows, cols).astype(self.dtype)
+            items.append((tuple(zip(self.names, scores)), sol))
+        return items
+
+    def _create(self, items):
+        """ Start the file from the first batch of solutions (call with the lock held) """
+        key, sol = items[0]
+        scores = [score for name, score in key]
+        score_dtype = "<i8" if all(isinstance(s, (int, np.integer)) for s in scores) else "<f8"
+        self._set_layout([name for name, score in key], np.shape(sol), score_dtype)
+        self._write(self._header())
+
+    def _write(self, data):
+        """ Replace the file's contents in one atomic rename """
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def fits(self, key, sol):
+        """ True if the (scores tuple, solution) pair can go in the store: there is no file
+        yet, or it holds the same objectives, score type and matrix shape """
+        if not os.path.exists(self.path):
+            return True
+        if self._record is None:
+            with self._locked(exclusive=False), open(self.path, "rb") as f:
+                self._read_header(f)
+        scores = [score for name, score in key]
+        score_dtype = "<i8" if all(isinstance(s, (int, np.integer)) for s in scores) else "<f8"
+        return ([name for name, score in key] == self.names and np.shape(sol) == self.shape
+                and score_dtype == self.score_dtype)
+
+    def clear(self):
+        """ Delete the file, e.g. one left behind by a run on another problem """
+        with self._locked(exclusive=True):
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        self.names = self.shape = self.score_dtype = self._record = None
+        self._inode, self._offset = None, 0
+
+    def append(self, items):
+        """ Append (scores tuple, solution) pairs. Unless other writers got in first since our
+        last read, our next read_new starts after them """
+        items = list(items)
+        if not items:
+            return
+        with self._locked(exclusive=True):
+            if not os.path.exists(self.path):
+                self._create(items)
+                self._inode, self._offset = os.stat(self.path).st_ino, len(self._header())
+            elif self._record is None:
+                with open(self.path, "rb") as f:
+                    self._read_header(f)
+            data = self._encode(items)
+            with open(self.path, "ab") as f:
+                stat = os.fstat(f.fileno())
+                caught_up = stat.st_ino == self._inode and stat.st_size == self._offset
+                f.write(data)
+            if caught_up:  # nothing unread before our records, so don't read them back
+                self._offset += len(data)
+
+    def read_new(self):
+        """ (scores tuple, solution) pairs appended since the last read.
+        If the file was compacted (replaced) in the meantime, everything is read again """
+        if not os.path.exists(self.path):
+            return []
+        with self._locked(exclusive=False):
+            with open(self.path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._inode:
+                    self._offset = self._read_header(f)
+                    self._inode = inode
+                f.seek(self._offset)
+                data = f.read()
+        whole = len(data) - len(data) % self._record.itemsize
+        self._offset += whole
+        return self._decode(data[:whole])
+
+    def read_all(self):
+        """ Every (scores tuple, solution) pair in the store """
+        self._inode = None
+        return self.read_new()
+
+    def count(self):
+        """ Number of records in the file """
+        if not os.path.exists(self.path):
+            return 0
+        if self._record is None:
+            with open(self.path, "rb") as f:
+                header = self._read_header(f)
+        else:
+            header = len(self._header())
+        return (os.path.getsize(self.path) - header) // self._record.itemsize
+
+    def compact(self, items=()):
+        """ Rewrite the store with only the non-dominated records (plus items), atomically """
+        with self._locked(exclusive=True):
+            merged = {}
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as f:
+                    header = self._read_header(f)
+                    f.seek(header)
+                    data = f.read()
+                merged.update(self._decode(data[:len(data) - len(data) % self._record.itemsize]))
+            merged.update(items)
+            if not merged:
+                return
+            if self._record is None:
+                self._create(list(merged.items()))
+
+            keys = list(merged)
+            scores = np.array([[score for name, score in key] for key in keys])
+            front = [(key, merged[key]) for key, keep in zip(keys, non_dominated(scores)) if keep]
+            self._write(self._header() + self._encode(front))
+        self._inode = None  # our next read starts over on the new file
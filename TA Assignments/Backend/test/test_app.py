@@ -0,0 +1,119 @@
+"""
+
+Py test for the Flask app helpers
+
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+import events
+import main
+from cache import FileCache
+from events import tail_metrics, follow_job
+
+
+def parse_event(text):
+    """ (event name or None, data) of one formatted Server-Sent Event """
+    event = None
+    for line in text.strip().split("\n"):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            data = json.loads(line[len("data: "):])
+    return event, data
+
+
+def test_tail_metrics(tmp_path, monkeypatch):
+    monkeypatch.setattr(events, "POLL_SECONDS", 0)
+    path = tmp_path / "metrics.jsonl"
+    path.write_text('{"iteration": 1}\n{"iteration": 2}\n{"iteration": 3}\n{"itera')
+
+    stream = tail_metrics(str(path), since=1)  # resuming after the first snapshot
+    assert parse_event(next(stream)) == (None, {"iteration": 2})
+    assert parse_event(next(stream)) == (None, {"iteration": 3})
+
+    with open(path, "a") as f:  # the partly written line is finished
+        f.write('tion": 4}\n')
+    assert parse_event(next(stream)) == (None, {"iteration": 4})
+
+    path.write_text('{"iteration": 1}\n')  # a new run truncates the log
+    assert parse_event(next(stream)) == ("reset", {})
+    assert parse_event(next(stream)) == (None, {"iteration": 1})
+
+
+class FakeJobs:
+    """ Hands out a fixed sequence of job statuses """
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+
+    def status(self, job_id):
+        return self.statuses.pop(0)
+
+
+def test_follow_job(monkeypatch):
+    monkeypatch.setattr(events, "POLL_SECONDS", 0)
+    running = [{"status": "running", "progress": None},
+               {"status": "running", "progress": {"iteration": 10}},
+               {"status": "running", "progress": {"iteration": 10}},  # nothing new, nothing sent
+               {"status": "running", "progress": {"iteration": 20}}]
+
+    for end in ("done", "failed"):
+        final = {"status": end, "progress": {"iteration": 30}}
+        sent = [parse_event(e) for e in follow_job(FakeJobs(running + [final]), "job")]
+        assert sent == [(None, {"iteration": 10}), (None, {"iteration": 20}),
+                        (None, {"iteration": 30}), (end, final)]
+
+    sent = [parse_event(e) for e in follow_job(FakeJobs(running[:2] + [None]), "job")]
+    assert sent == [(None, {"iteration": 10}), ("gone", {"id": "job", "status": "gone"})]
+
+
+def test_file_cache(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("one")
+    parsed = []
+
+    def parse(p):
+        parsed.append(p)
+        with open(p) as f:
+            return f.read()
+
+    cache = FileCache()
+    assert cache.get(str(path), parse) == cache.get(str(path), parse) == "one"
+    assert len(parsed) == 1  # the second call came from the cache
+
+    path.write_text("two")
+    later = time.time_ns() + 10 ** 10
+    os.utime(path, ns=(later, later))  # a newer mtime, whatever the file system's resolution
+    assert cache.get(str(path), parse) == "two"
+    assert len(parsed) == 2
+    assert FileCache.validators(str(tmp_path / "missing.txt")) is None
+
+
+def test_conditional_responses(tmp_path, monkeypatch):
+    """ Cached routes send ETag / Last-Modified, answer 304 to a client that is up to date
+    and serve the new contents once the file changes """
+    monkeypatch.setattr(main, "OUTPUT_PATH", str(tmp_path))
+    monkeypatch.setattr(main, "cache", FileCache())
+    client = main.app.test_client()
+    assert client.get("/api/final-results").status_code == 404
+
+    path = tmp_path / "best_solution.txt"
+    path.write_text("Conflicts: 3\nUndersupport: 1\n")
+    first = client.get("/api/final-results")
+    assert first.status_code == 200 and first.get_json() == {"Conflicts": "3", "Undersupport": "1"}
+    etag, last_modified = first.headers["ETag"], first.headers["Last-Modified"]
+
+    assert client.get("/api/final-results", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/final-results", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    path.write_text("Conflicts: 0\nUndersupport: 1\n")
+    later = time.time_ns() + 10 ** 10
+    os.utime(path, ns=(later, later))
+    changed = client.get("/api/final-results", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.get_json()["Conflicts"] == "0"
+    assert changed.headers["ETag"] != etag
@@ -5,8 +5,16 @@ Py test for assignta.py
 """
 
 import numpy as np
-from dstrut.profiler import build_profiles, profiler
+from dstrut.profiler import build_profiles, profiler, Profiler
 from dstrut.assignta import overallocation, conflicts, undersupport, unavailable, unpreferred
+from dstrut.assignta import swap_assignment_agent, mutation_agent, build_evo, reference_point, update_front, REF_FLOOR
+from dstrut.assignta import drop_unavailable_agent, resolve_clashes_agent, trim_overallocated_agent, fill_undersupport_agent
+from dstrut.generate import generate
+from dstrut.seeding import flow_seed, seed_solutions
+from dstrut.profiler import profiles_from_frames
+from dstrut.problem import Problem, Tally
+from dstrut.packed import PackedSolution
+from dstrut.pareto import hypervolume
 import time
 from dstrut.evo_p import get_output_path
 
@@ -40,6 +48,190 @@ def test_test3_scores():
     assert unavailable(sol, tas) == 34, "Unavailable wrong"
     assert unpreferred(sol, tas) == 17, "Unpreferred wrong"
 
+def test_compiled_problem_scores():
+    """Scores against a compiled Problem match the raw section/TA lists"""
+    sections, tas = build_profiles("../assignta_data/sections.csv", "../assignta_data/tas.csv")
+    problem = Problem(sections, tas)
+    assert problem.shape == (40, 17)
+    for filename in ["test1.csv", "test2.csv", "test3.csv"]:
+        sol = load_test_solution(filename)
+        assert overallocation(sol, problem) == overallocation(sol, tas)
+        assert conflicts(sol, problem) == conflicts(sol, sections)
+        assert undersupport(sol, problem) == undersupport(sol, sections)
+        assert unavailable(sol, problem) == unavailable(sol, tas)
+        assert unpreferred(sol, problem) == unpreferred(sol, tas)
+
+def test_batched_scores():
+    """A stacked batch scores the same as each solution on its own"""
+    sections, tas = build_profiles("../assignta_data/sections.csv", "../assignta_data/tas.csv")
+    problem = Problem(sections, tas)
+    sols = [load_test_solution(f"test{i}.csv") for i in (1, 2, 3)]
+    batch = np.stack(sols)
+    for objective in [overallocation, conflicts, undersupport, unavailable, unpreferred]:
+        assert objective(batch, problem).tolist() == [objective(sol, problem) for sol in sols]
+
+def full_scores(sol, problem):
+    return {'overallocation': overallocation(sol, problem),
+            'conflicts': conflicts(sol, problem),
+            'undersupport': undersupport(sol, problem),
+            'unavailable': unavailable(sol, problem),
+            'unpreferred': unpreferred(sol, problem)}
+
+
+def test_incremental_tally():
+    """Updating a parent's tally with the flipped cells matches scoring the child from scratch"""
+    sections, tas = build_profiles("../assignta_data/sections.csv", "../assignta_data/tas.csv")
+    problem = Problem(sections, tas)
+    parent = load_test_solution("test1.csv")
+    tally = Tally(problem, parent)
+    assert tally.scores() == full_scores(parent, problem)
+
+    for _ in range(200):
+        agent = swap_assignment_agent if np.random.rand() < 0.5 else mutation_agent
+        child, flipped = agent([parent])
+        child_tally = tally.update(parent, child, flipped)
+        assert child_tally.scores() == full_scores(child, problem)
+        parent, tally = child, child_tally
+
+def test_packed_scores():
+    """Popcount scoring of a bit-packed solution matches the matrix"""
+    sections, tas = build_profiles("../assignta_data/sections.csv", "../assignta_data/tas.csv")
+    problem = Problem(sections, tas)
+    sols = [load_test_solution(f"test{i}.csv") for i in (1, 2, 3)] + list(np.random.randint(0, 2, size=(20, 40, 17)))
+    for sol in sols:
+        packed = PackedSolution.from_matrix(sol)
+        assert (packed.to_matrix() == sol).all()
+        assert full_scores(packed, problem) == full_scores(sol, problem)
+
+    copied = packed.copy()
+    copied.flip(0, 0)
+    assert copied != packed and copied.to_matrix()[0, 0] == 1 - sol[0, 0]
+
+def test_agents_leave_parents_untouched():
+    """Every agent copies before writing, so Evo can hand out read-only parents"""
+    E = build_evo("../assignta_data/sections.csv", "../assignta_data/tas.csv")
+    for name, (op, k) in E.agents.items():
+        for _ in range(20):
+            op(E.get_random_solutions(k))  # raises if an agent writes to a parent
+
+
+def test_repair_agents():
+    """Each repair agent clears its own violation without adding any other kind"""
+    problem = Problem(*build_profiles("../assignta_data/sections.csv", "../assignta_data/tas.csv"))
+    repairs = {"unavailable": drop_unavailable_agent, "conflicts": resolve_clashes_agent,
+               "overallocation": trim_overallocated_agent}
+    for _ in range(10):
+        parent = np.random.randint(0, 2, size=problem.shape, dtype=np.int8)
+        before = full_scores(parent, problem)
+        for objective, agent in repairs.items():
+            child, cells = agent([parent], problem)
+            after = full_scores(child, problem)
+            assert after[objective] == 0
+            assert all(after[name] <= before[name] for name in after if name != "undersupport")
+            assert sorted(cells) == sorted(map(tuple, np.argwhere(child != parent).tolist()))
+
+        # filling only uses available TAs with room in a free timeslot
+        parent = np.zeros(problem.shape, dtype=np.int8)
+        child, cells = fill_undersupport_agent([parent], problem)
+        after = full_scores(child, problem)
+        assert after["undersupport"] < full_scores(parent, problem)["undersupport"]
+        assert after["overallocation"] == after["conflicts"] == after["unavailable"] == 0
+
+
+def test_generated_problem():
+    """The agents and objectives work at any problem size, not just 40 x 17"""
+    sections, tas = generate(n_sections=45, n_tas=70, seed=1)
+    assert list(sections.columns) == ["section", "instructor", "daytime", "location", "students",
+                                      "topic", "min_ta", "max_ta"]
+    assert list(tas.columns[:3]) == ["ta_id", "name", "max_assigned"] and len(tas.columns) == 3 + 45
+    problem = Problem(*profiles_from_frames(sections, tas))
+    assert problem.shape == (70, 45)
+
+    E = build_evo(problem=problem)
+    for name, (op, k) in E.agents.items():
+        child = op(E.get_random_solutions(k))
+        child = child[0] if name in E.deltas else child
+        assert child.shape == (70, 45), name
+    E.evolve(n=200, dom=50, sync=None, batch=8, verbose=False)
+    for key, sol in E.pop.items():
+        assert dict(key) == full_scores(sol, problem)
+
+    ref = reference_point(problem)
+    assert len(ref) == 5 and (ref > 0).all()
+
+
+def test_front_quality(tmp_path):
+    """Snapshots report hypervolume, and IGD once there is a reference front"""
+    E = build_evo("../assignta_data/sections.csv", "../assignta_data/tas.csv")
+    snaps = []
+    E.add_listener(snaps.append)
+    E.evolve(n=300, dom=50, sync=None, batch=8, verbose=False)
+    assert 0 < snaps[-1]["quality"]["hypervolume"] <= 1
+    assert "igd" not in snaps[-1]["quality"]
+
+    front = update_front(str(tmp_path / "front.csv"), E.pop.scores())
+    assert len(front) == len(E.pop)
+    assert (update_front(str(tmp_path / "front.csv"), E.pop.scores()) == front).all()  # nothing new
+
+    E = build_evo("../assignta_data/sections.csv", "../assignta_data/tas.csv", reference_front=front)
+    assert E.snapshot(0, 1.0, 0.0)["quality"]["igd"] > 0
+
+
+def test_reference_point_sees_undersupport():
+    """Fronts that differ only in undersupport get different hypervolumes"""
+    problem = Problem(*build_profiles("../assignta_data/sections.csv", "../assignta_data/tas.csv"))
+    ref = reference_point(problem)
+    assert (ref >= REF_FLOOR).all()
+
+    def hv(front):
+        return hypervolume(np.asarray(front) / ref, np.ones(len(ref)), samples=20000)
+
+    assert hv([[0, 0, 1, 0, 0]]) > 0
+    assert hv([[0, 0, 0, 0, 3], [0, 0, 3, 0, 0]]) > hv([[0, 0, 0, 0, 3], [0, 0, 5, 0, 0]]) > hv([[0, 0, 0, 0, 3]])
+
+
+def test_no_flow_seeds(monkeypatch):
+    """flow_seeds=False doesn't run the min-cost flow at all, not even for the reference point"""
+    import dstrut.assignta
+
+    def no_flow(problem):
+        raise AssertionError("seed_solutions called")
+
+    monkeypatch.setattr(dstrut.assignta, "seed_solutions", no_flow)
+    E = build_evo("../assignta_data/sections.csv", "../assignta_data/tas.csv", flow_seeds=False)
+    assert len(E.pop) > 0 and "hypervolume" in E.snapshot(0, 1.0, 0.0)["quality"]
+
+
+def test_flow_seeds():
+    """The min-cost flow seeds respect every hard constraint they aren't told to relax"""
+    problem = Problem(*build_profiles("../assignta_data/sections.csv", "../assignta_data/tas.csv"))
+    seed = flow_seed(problem)
+    assert full_scores(seed, problem) == {"overallocation": 0, "conflicts": 0, "undersupport": 0,
+                                          "unavailable": 0, "unpreferred": 3}
+    assert len(seed_solutions(problem)) == 2  # the other one avoids "W" at the cost of support
+
+    # with no capacity left, only the relaxed seeds can support the sections
+    problem.max_assigned[:] = 0
+    seeds = seed_solutions(problem)
+    assert full_scores(seeds[0], problem)["undersupport"] == problem.min_ta.sum()
+    assert min(full_scores(sol, problem)["undersupport"] for sol in seeds) == 0
+    assert all(full_scores(sol, problem)["conflicts"] == 0 for sol in seeds)
+
+
+def run_seeded(seed):
+    E = build_evo("../assignta_data/sections.csv", "../assignta_data/tas.csv", flow_seeds=False, seed=seed)
+    E.evolve(n=400, dom=50, sync=None, batch=8, verbose=False)
+    return E
+
+
+def test_seeded_runs_repeat():
+    """The same seed gives the same front, down to every solution"""
+    first, again, other = run_seeded(3), run_seeded(3), run_seeded(4)
+    assert list(first.pop.keys()) == list(again.pop.keys())
+    assert all((first.pop[key] == again.pop[key]).all() for key in first.pop.keys())
+    assert first.agent_stats() == again.agent_stats()
+    assert set(first.pop.keys()) != set(other.pop.keys())
+
 
 def test_profiler():
     """Test the profiler with your objective functions"""
@@ -73,4 +265,37 @@ def test_profiler():
     profiler.stop_profiling()
 
     profiler.report()
-    profiler.save_report("test_profile.txt")
\ No newline at end of file
+    profiler.save_report("test_profile.txt")
+
+
+def test_profiler_modes():
+    """Sampled mode counts every call but times only some; off mode is a passthrough"""
+    sampled = Profiler(mode="sampled", sample_every=10)
+    square = sampled.profile(lambda x: x * x)
+    assert [square(i) for i in range(100)][-1] == 99 * 99
+    assert sampled.call_counts["<lambda>"] == 100
+    assert sampled.timed_counts["<lambda>"] == 10
+    assert sampled.total_time("<lambda>") > 0
+    p50, p95, p99 = sampled.percentiles("<lambda>")
+    assert 0 < p50 <= p95 <= p99
+
+    off = Profiler(mode="off")
+    f = lambda x: x
+    assert off.profile(f) is f
+
+
+def test_profiler_merge():
+    """A worker's counts, sent with counts(), add up in the master's profiler"""
+    worker, master = Profiler(max_samples=50), Profiler(max_samples=50)
+    square = worker.profile(lambda x: x * x)
+    master_square = master.profile(lambda x: x * x)
+    for i in range(40):
+        square(i)
+        master_square(i)
+    master.merge(worker.counts())
+    assert master.call_counts["<lambda>"] == master.timed_counts["<lambda>"] == 80
+    assert len(master.samples["<lambda>"]) == 50
+
+    worker.reset()
+    square(1)  # the decorated function still counts into the reset profiler
+    assert worker.call_counts["<lambda>"] == 1
@@ -0,0 +1,280 @@
+"""
+
+Py test for evo_p.py
+
+"""
+
+import json
+import numpy as np
+import pytest
+from functools import reduce
+from dstrut.evo_p import Evo
+from dstrut.archive import Archive
+from dstrut.islands import run_islands
+from dstrut.profiler import MetricsLog
+from dstrut.store import SolutionStore
+from dstrut.packed import PackedSolution, pack, unpack
+from dstrut.scheduler import BanditScheduler
+from dstrut.pareto import non_dominated, pairwise_non_dominated, skyline_non_dominated, hypervolume, igd
+
+
+def make_evo(batched=True):
+    E = Evo()
+    E.add_objective("ones", lambda sol: sol.sum(axis=(-2, -1)), batched=batched)
+    E.add_objective("first_row", lambda sol: sol[..., 0, :].sum(axis=-1), batched=batched)
+    E.add_agent("flip", lambda sols: 1 - sols[0], 1)
+    E.add_agent("random", lambda sols: np.random.randint(0, 2, size=(4, 5)), 0)
+    return E
+
+
+def test_evaluate_matrix():
+    E = make_evo()
+    sols = [np.random.randint(0, 2, size=(4, 5)) for _ in range(6)]
+    scores = E.evaluate(sols)
+    assert scores.shape == (6, 2)
+    assert scores[:, 0].tolist() == [int(sol.sum()) for sol in sols]
+
+    # unbatched objectives are scored one solution at a time but give the same matrix
+    assert (make_evo(batched=False).evaluate(sols) == scores).all()
+
+
+def test_evolve_batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # evolve syncs through solutions.dat in the cwd
+    E = make_evo()
+    E.add_solution(np.zeros((4, 5), dtype=int))
+    E.evolve(n=200, dom=50, sync=10**9, batch=8)
+    assert len(E.pop) > 0
+    for scores, sol in E.pop.items():
+        assert dict(scores)["ones"] == int(sol.sum())
+
+
+def test_non_dominated_matches_reduce():
+    scores = np.random.randint(0, 6, size=(1500, 4))
+    keys = {tuple((f"obj{j}", int(v)) for j, v in enumerate(row)) for row in scores}
+    expected = reduce(Evo.reduce_nds, keys, keys)
+
+    keys = list(keys)
+    matrix = np.array([[v for _, v in key] for key in keys])
+    for nds in [pairwise_non_dominated, skyline_non_dominated, non_dominated]:
+        assert {key for key, keep in zip(keys, nds(matrix)) if keep} == expected
+
+
+def test_archive_cap():
+    for eviction in ["crowding", "epsilon"]:
+        archive = Archive(max_size=20, eviction=eviction, epsilon=3)
+        for x in range(100):
+            archive[(("a", x), ("b", 99 - x))] = x  # every member is non-dominated
+        assert len(archive) <= 20 + archive.slack
+        archive.trim()
+        assert len(archive) == 20
+        assert archive.sample() in set(archive.values())
+        # the two extremes of the front survive crowding eviction
+        assert (("a", 0), ("b", 99)) in archive and (("a", 99), ("b", 0)) in archive
+
+    archive = Archive()
+    archive[(("a", 1),)] = "x"
+    archive[(("a", 2),)] = "y"
+    del archive[(("a", 1),)]
+    assert list(archive.items()) == [((("a", 2),), "y")] and archive.sample() == "y"
+
+
+def test_run_islands(tmp_path):
+    def seeded_evo():
+        E = make_evo()
+        E.add_solution(np.zeros((4, 5), dtype=int))
+        return E
+
+    metrics = MetricsLog(str(tmp_path / "metrics.jsonl"))
+    E = run_islands(seeded_evo, islands=2, time_limit=1, migrate_every=0.25, seed=0, listeners=[metrics])
+    assert len(E.pop) > 0
+    for scores, sol in E.pop.items():
+        assert dict(scores)["ones"] == int(sol.sum())
+
+    # the master reports the merged front after every migration
+    with open(metrics.path) as f:
+        snaps = [json.loads(line) for line in f]
+    assert len(snaps) >= 2 and snaps == metrics.snapshots
+    assert snaps[-1]["iteration"] > snaps[0]["iteration"] > 0
+    assert len(snaps) <= 1 / 0.25 + 2  # once per migration round, not once per island message
+    assert all(snap["evals_per_sec"] > 0 for snap in snaps)
+
+    # and the islands' agent credit
+    stats = E.agent_stats()
+    assert set(stats) == {"flip", "random"}
+    assert sum(s["calls"] for s in stats.values()) == snaps[-1]["iteration"]
+
+
+def test_solution_store(tmp_path):
+    path = str(tmp_path / "solutions.evo")
+    items = [((("ones", int(sol.sum())), ("x", i)), sol)
+             for i, sol in enumerate(np.random.randint(0, 2, size=(10, 40, 17)))]
+
+    writer, reader = SolutionStore(path), SolutionStore(path)
+    writer.append(items[:6])
+    first = reader.read_new()
+    writer.append(items[6:])
+    second = reader.read_new()  # only the records appended since the last read
+    assert [key for key, sol in first + second] == [key for key, sol in items]
+    assert all((sol == orig).all() for (_, sol), (_, orig) in zip(first + second, items))
+    assert all(sol.dtype == np.int8 for _, sol in first + second)
+    assert writer.read_new() == []  # a writer doesn't read its own records back
+    assert writer.count() == 10
+
+    writer.compact()
+    scores = np.array([[v for _, v in key] for key, sol in items])
+    front = {key for (key, sol), keep in zip(items, non_dominated(scores)) if keep}
+    assert {key for key, sol in reader.read_new()} == front  # compaction is noticed and re-read
+
+
+def test_evo_sync(tmp_path):
+    path = str(tmp_path / "solutions.evo")
+    A, B = make_evo(), make_evo()
+    A.add_solution(np.zeros((4, 5), dtype=int))
+    A.sync(path)
+    B.sync(path)
+    assert list(B.pop.keys()) == list(A.pop.keys())
+
+
+def test_evo_sync_other_problem(tmp_path):
+    """ A store left by a run with other objectives or shapes is replaced, not appended to """
+    path = str(tmp_path / "solutions.evo")
+    A = make_evo()
+    A.add_solution(np.zeros((4, 5), dtype=int))
+    A.sync(path)
+
+    C = Evo()
+    C.add_objective("ones", lambda sol: int(sol.sum()))
+    C.add_solution(np.ones((3, 3), dtype=int))
+    C.sync(path)
+    assert list(C.pop.keys()) == [(("ones", 9),)]
+    assert SolutionStore(path).read_all()[0][0] == (("ones", 9),)
+
+
+def test_packed_archive():
+    archive = Archive(codec=(pack, unpack))
+    sol = np.random.randint(0, 2, size=(4, 5))
+    archive[(("a", 1),)] = sol
+    assert isinstance(archive.stored((("a", 1),)), PackedSolution)
+    assert (archive.sample() == sol).all() and archive.sample() is not archive.sample()
+
+
+def test_parents_are_read_only_views():
+    E = make_evo()
+    sol = np.zeros((4, 5), dtype=int)
+    E.add_solution(sol)
+    parent = E.get_random_solutions(1)[0]
+    assert np.shares_memory(parent, sol)
+    with pytest.raises(ValueError):
+        parent[0, 0] = 1
+    assert parent.copy().flags.writeable
+
+
+def test_bandit_scheduler():
+    bandit = BanditScheduler(rng=np.random.default_rng(0))
+    names = ["good", "bad"]
+    for _ in range(200):
+        for name in bandit.pick(names, 4):
+            bandit.reward(name, name == "good")
+    stats = bandit.stats()
+    assert stats["good"]["weight"] > 0.8 and stats["bad"]["weight"] > 0  # bad is never starved
+    assert stats["good"]["calls"] > stats["bad"]["calls"] and stats["bad"]["kept"] == 0
+
+
+def test_bandit_drops_useless_agent():
+    """ With sparse successes, like a settled front, an agent that never succeeds
+    gets less than its uniform share of the picks """
+    rng = np.random.default_rng(1)
+    rates = {"never": 0.0, "a": 0.01, "b": 0.01, "c": 0.02, "d": 0.01}
+    bandit = BanditScheduler(rng=rng)
+    picks = []
+    for _ in range(5000):
+        for name in bandit.pick(list(rates), 4):
+            bandit.reward(name, rng.random() < rates[name])
+            picks.append(name)
+    late = picks[len(picks) // 2:]
+    assert late.count("never") / len(late) < 1 / len(rates)
+    assert bandit.stats()["never"]["weight"] < 1 / len(rates)
+
+
+def test_credit_on_entering_front():
+    """ An offspring that enters the front earns credit even if a later one dominates it """
+    E = make_evo()
+    E.add_solution(np.ones((4, 5), dtype=int))
+    E.remove_dominated()
+    sol = np.zeros((4, 5), dtype=int)  # the scores below are made up; only they matter here
+    E._add_offspring("first", (("ones", 10), ("first_row", 5)), sol)
+    E._add_offspring("second", (("ones", 5), ("first_row", 5)), sol)  # dominates first
+    E._add_offspring("worse", (("ones", 20), ("first_row", 6)), sol)  # dominated by the old front
+    E.remove_dominated()
+    stats = E.agent_stats()
+    assert stats["first"]["kept"] == stats["second"]["kept"] == 1 and stats["worse"]["kept"] == 0
+
+
+def test_agent_stats_before_any_run():
+    """ A fresh Evo has no credit history yet, e.g. the one run_islands hands back """
+    E = make_evo()
+    E.set_scheduler(BanditScheduler())
+    assert E.agent_stats() == {}
+
+
+def test_evolve_credits_agents(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    E = make_evo()
+    E.set_scheduler(BanditScheduler())
+    E.add_solution(np.zeros((4, 5), dtype=int))
+    E.evolve(n=300, dom=20, sync=None, verbose=False)
+    stats = E.agent_stats()
+    assert set(stats) == {"flip", "random"}
+    assert sum(s["calls"] for s in stats.values()) == 300
+
+
+def test_evolve_snapshots():
+    E = make_evo()
+    E.add_solution(np.zeros((4, 5), dtype=int))
+    snaps = []
+    E.add_listener(snaps.append)
+    E.evolve(n=500, dom=10, sync=None, verbose=False, snapshot_every=0)
+    assert len(snaps) > 1 and snaps[-1]["iteration"] == 500
+    assert snaps[-1]["front_size"] == len(E.pop)
+    assert set(snaps[-1]["best"]) == {"ones", "first_row"}
+
+
+def test_hypervolume():
+    ref = [4, 4]
+    # the two boxes [1, 4] x [3, 4] and [3, 4] x [1, 4] overlap in one unit square: 3 + 3 - 1
+    assert hypervolume([[1, 3], [3, 1]], ref) == pytest.approx(5, abs=0.1)
+    assert hypervolume([[1, 3], [3, 1], [3, 3]], ref) == hypervolume([[1, 3], [3, 1]], ref)  # dominated
+    assert hypervolume([[5, 0]], ref) == 0.0  # outside the box
+
+    # a front that dominates another never scores lower
+    worse = np.random.randint(1, 10, size=(30, 3))
+    better = np.vstack([worse, worse[:5] - 1])
+    assert hypervolume(better, [10, 10, 10]) >= hypervolume(worse, [10, 10, 10])
+
+
+def test_igd():
+    reference = [[0, 2], [2, 0]]
+    assert igd(reference, reference) == 0
+    assert igd([[0, 2]], reference) == pytest.approx(np.sqrt(8) / 2)
+
+
+def test_indicators_in_snapshots():
+    E = make_evo()
+    E.add_indicator("min_ones", lambda scores: scores[:, 0].min())
+    E.add_solution(np.random.randint(0, 2, size=(4, 5)))
+    snaps = []
+    E.add_listener(snaps.append)
+    E.evolve(n=100, dom=10, sync=None, batch=4, verbose=False, snapshot_every=0)
+    assert snaps and all("quality" in snap for snap in snaps)
+    assert snaps[-1]["quality"]["min_ones"] == snaps[-1]["best"]["ones"]
+
+
+def test_spawned_streams():
+    E = Evo(seed=1)
+    children = E.spawn(3)
+    draws = [np.random.default_rng(child).integers(1 << 30, size=4).tolist() for child in children]
+    assert len({tuple(d) for d in draws}) == 3  # independent streams
+    assert [s.spawn_key for s in Evo(seed=1).spawn(3)] == [s.spawn_key for s in children]
+
+    E.reseed(children[0])
+    assert E.pop.rng is E.rng and E.scheduler.rng is E.rng
@@ -0,0 +1,72 @@
+"""
+
+Py test for jobs.py
+
+"""
+
+import time
+from concurrent.futures import Future
+import pandas as pd
+import pytest
+from dstrut import jobs as jobs_module
+from dstrut.jobs import JobManager, load_problem
+
+
+def test_load_problem():
+    default = load_problem()
+    assert default.shape == (40, 17)
+
+    inline = load_problem({"sections": pd.read_csv("../assignta_data/sections.csv").to_dict("records"),
+                           "tas": pd.read_csv("../assignta_data/tas.csv").to_dict("records")})
+    assert (inline.unavailable == default.unavailable).all()
+    assert (inline.incidence == default.incidence).all()
+
+    with pytest.raises(TypeError):
+        load_problem(["sections.csv"])
+
+
+def test_job_lifecycle():
+    jobs = JobManager(workers=2)
+    try:
+        job_id = jobs.submit(time_limit=1, seed=3)
+        assert jobs.status(job_id)["status"] in ("queued", "running")
+        assert jobs.status("missing") is None
+
+        for _ in range(120):
+            if jobs.status(job_id)["status"] in ("done", "failed"):
+                break
+            time.sleep(0.5)
+        status = jobs.status(job_id)
+        assert status["status"] == "done", status
+        assert status["progress"]["iteration"] > 0
+
+        front = jobs.front(job_id)
+        assert len(front) > 0
+        assert set(front[0]["scores"]) == {"overallocation", "conflicts", "undersupport", "unavailable", "unpreferred"}
+    finally:
+        jobs.shutdown()
+
+
+def test_submit_rejects_bad_input(monkeypatch):
+    jobs = JobManager(workers=1)
+    try:
+        for seed in (-1, 2 ** 63):
+            with pytest.raises(ValueError):
+                jobs.submit(time_limit=1, seed=seed)
+        with pytest.raises(TypeError):
+            jobs.submit(problem="x", time_limit=1)
+        assert jobs.jobs == {}
+
+        # only the newest KEEP_FINISHED finished jobs are remembered
+        monkeypatch.setattr(jobs_module, "KEEP_FINISHED", 2)
+        for i in range(4):
+            future = Future()
+            future.set_result([])
+            jobs.jobs[f"old{i}"] = {"future": future, "params": {}, "submitted": i}
+            jobs.progress[f"old{i}"] = {}
+        jobs.jobs["queued"] = {"future": Future(), "params": {}, "submitted": 4}
+        jobs._forget_finished()
+        assert list(jobs.jobs) == ["old2", "old3", "queued"]
+        assert set(jobs.progress.keys()) == {"old2", "old3"}
+    finally:
+        jobs.shutdown()
@@ -113,12 +113,128 @@ async function loadD3Visualizations() {
     drawBarChart(svg1, profilerData, "function", "avg_time");
 }
 
+// Live optimization metrics (snapshots Evo.evolve streams as Server-Sent Events)
+const metrics = [];
+const METRICS_POLL_MS = 2000;
+let metricsChart = null;
+
+// Build the chart skeleton once; the returned function rescales it to new data
+// and moves the existing lines instead of redrawing the whole svg
+function createLineChart(svg, xKey, series) {
+    const width = 800;
+    const height = 300;
+    const margin = { top: 30, right: 80, bottom: 40, left: 80 };
+
+    const innerWidth = width - margin.left - margin.right;
+    const innerHeight = height - margin.top - margin.bottom;
+
+    const g = svg
+        .attr("width", width)
+        .attr("height", height)
+        .append("g")
+        .attr("transform", `translate(${margin.left},${margin.top})`);
+
+    const x = d3.scaleLinear().range([0, innerWidth]);
+    const xAxis = g.append("g").attr("transform", `translate(0,${innerHeight})`);
+
+    // one y axis per series: first on the left, second on the right
+    const lines = series.map((s, idx) => {
+        const y = d3.scaleLinear().range([innerHeight, 0]);
+        const axis = g.append("g")
+            .attr("transform", idx === 0 ? "" : `translate(${innerWidth},0)`);
+        const path = g.append("path")
+            .attr("fill", "none")
+            .attr("stroke", s.color)
+            .attr("stroke-width", 2);
+
+        g.append("text")
+            .attr("x", idx === 0 ? 0 : innerWidth)
+            .attr("y", -10)
+            .attr("text-anchor", idx === 0 ? "start" : "end")
+            .style("font-size", "12px")
+            .attr("fill", s.color)
+            .text(s.label);
+
+        return { ...s, idx, y, axis, path };
+    });
+
+    g.append("text")
+        .attr("x", innerWidth / 2)
+        .attr("y", innerHeight + 35)
+        .attr("text-anchor", "middle")
+        .style("font-size", "12px")
+        .attr("fill", "white")
+        .text("Elapsed time (s)");
+
+    return function update(data) {
+        x.domain(d3.extent(data, d => d[xKey]));
+        xAxis.call(d3.axisBottom(x));
+        lines.forEach(l => {
+            l.y.domain([0, d3.max(data, d => d[l.key]) || 1]).nice();
+            l.axis.call(l.idx === 0 ? d3.axisLeft(l.y) : d3.axisRight(l.y));
+            l.path.datum(data).attr("d", d3.line().x(d => x(d[xKey])).y(d => l.y(d[l.key])));
+        });
+    };
+}
+
+function showMetrics() {
+    if (metrics.length === 0) {
+        return;
+    }
+    const latest = metrics[metrics.length - 1];
+    document.querySelector("#metrics-chart .metrics-latest").textContent =
+        `${latest.evals_per_sec} evals/sec, front size ${latest.front_size}, best ` +
+        JSON.stringify(latest.best) + (latest.quality ? `, quality ${JSON.stringify(latest.quality)}` : "");
+    if (metricsChart === null) {
+        metricsChart = createLineChart(d3.select("#metrics-chart svg"), "elapsed", [
+            { key: "evals_per_sec", label: "Evals / sec", color: "steelblue" },
+            { key: "front_size", label: "Front size", color: "orange" }
+        ]);
+    }
+    metricsChart(metrics);
+}
+
+async function pollMetrics() {
+    const fresh = await fetchJSON(`/metrics?since=${metrics.length}`);
+    if (fresh.length > 0) {
+        metrics.push(...fresh);
+        showMetrics();
+    }
+}
+
+// Follow the run over Server-Sent Events; fall back to polling if the browser can't
+function streamMetrics() {
+    if (!window.EventSource) {
+        setInterval(pollMetrics, METRICS_POLL_MS);
+        return;
+    }
+    let source = null;
+    const connect = () => {
+        // since= makes a reconnect resume after the snapshots we already have
+        source = new EventSource(new URL(`/api/events?since=${metrics.length}`, BASE_PATH));
+        source.onmessage = event => {
+            metrics.push(JSON.parse(event.data));
+            showMetrics();
+        };
+        source.addEventListener("reset", () => {
+            metrics.length = 0;  // a new run started
+        });
+        source.onerror = () => {
+            source.close();
+            setTimeout(connect, METRICS_POLL_MS);
+        };
+    };
+    connect();
+}
+
 
 // Initialize everything
 async function init() {
     await loadTextFiles();
     setupCharts();
     await loadD3Visualizations();
+    await pollMetrics();
+    streamMetrics();
 }
 
 // Start
@@ -8,7 +8,8 @@ This should be the starting point for HW5.
 """
 
 import random as rnd
-import copy
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
@@ -22,11 +23,16 @@ INIT_FOXES = 100 # Initial # of foxes
 GRASS_RATE = 0.50  # Probability that grass grows back at any given location
 OFFSPRING = 5  # Maximum number of offspring
 
-rabbit_pop = []
-fox_pop = []
+# every setting a headless run or a sweep can vary, with the values main() uses
+DEFAULTS = {"size": ARRSIZE, "grass_rate": GRASS_RATE,
+            "rabbits": INIT_RABBITS, "rabbit_offspring": 1, "rabbit_starvation": 2, "rabbit_reproduction": 2,
+            "foxes": INIT_FOXES, "fox_offspring": OFFSPRING, "fox_starvation": 50, "fox_reproduction": 1}
 
 
 class Animal:
+    # fixed attributes: no per-animal __dict__, and clone() knows exactly what to copy
+    __slots__ = ("x", "y", "eaten", "max_offspring", "starvation_level", "reproduction_level", "hunger", "alive")
+
     def __init__(self, max_offspring=1, starvation_level=1, reproduction_level=1):
         """ Constructor """
         self.x = rnd.randrange(0, ARRSIZE)
@@ -48,10 +54,23 @@ class Animal:
         """ Animals eat"""
         self.eaten += amount
 
+    def clone(self):
+        """ An identical animal, copied attribute by attribute (no deepcopy, no random placement) """
+        baby = type(self).__new__(type(self))  # subclasses clone as themselves
+        baby.x, baby.y, baby.eaten, baby.hunger, baby.alive = self.x, self.y, self.eaten, self.hunger, self.alive
+        baby.max_offspring = self.max_offspring
+        baby.starvation_level = self.starvation_level
+        baby.reproduction_level = self.reproduction_level
+        return baby
+
     def reproduce(self):
         """ Animals make babies """
         #self.eaten = 0
-        return copy.deepcopy(self)
+        return self.clone()
+
+    def litter(self, n):
+        """ n babies at once """
+        return [self.clone() for _ in range(n)]
 
 
 class Field:
@@ -137,16 +156,14 @@ class Field:
         rabbit_born = []
         for r in self.rabbits:
             if r.eaten >= r.reproduction_level:
-                for _ in range(rnd.randint(0, r.max_offspring)):
-                    rabbit_born.append(r.reproduce())
+                rabbit_born += r.litter(rnd.randint(0, r.max_offspring))
 
         self.rabbits += rabbit_born   # append the new rabbits to the field!
 
         fox_born = []
         for f in self.foxes:
             if f.eaten >= f.reproduction_level:
-                for _ in range(rnd.randint(0,f.max_offspring)):
-                    fox_born.append(f.reproduce())
+                fox_born += f.litter(rnd.randint(0, f.max_offspring))
         self.foxes += fox_born
 
     def generation(self):
@@ -172,21 +189,274 @@ class Field:
         return display
 
 
-def animate(i, field, im):
+class Herd:
+    """ One species stored as a struct of arrays: animal i is row i of every array """
+
+    FIELDS = {"x": int, "y": int, "eaten": int, "hunger": int, "alive": bool,
+              "max_offspring": int, "starvation_level": int, "reproduction_level": int}
+
+    def __init__(self, **columns):
+        """ Constructor: empty, or from equally long columns named like FIELDS """
+        for name, dtype in Herd.FIELDS.items():
+            setattr(self, name, np.asarray(columns.get(name, []), dtype=dtype))
+
+    def __len__(self):
+        return len(self.x)
+
+    def take(self, idx):
+        """ A new herd of the animals at idx (an index array or a boolean mask) """
+        return Herd(**{name: getattr(self, name)[idx] for name in Herd.FIELDS})
+
+    def extend(self, other):
+        """ Append another herd's animals after ours """
+        for name in Herd.FIELDS:
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(other, name)]))
+
+    @staticmethod
+    def from_animals(animals):
+        return Herd(**{name: [getattr(a, name) for a in animals] for name in Herd.FIELDS})
+
+
+ONE = np.int32(1)  # count increment with the count grid's dtype (an untyped 1 makes np.add.at ~10x slower)
+
+
+class GridIndex:
+    """ Where one herd is on the grid, kept in two persistent size x size arrays:
+    count - how many animals are on each cell
+    first - the lowest index among them, i.e. the animal first in list order
+    (only valid from rebuild until animals are removed) """
+
+    def __init__(self, size):
+        self.size = size
+        self.count = np.zeros((size, size), dtype=np.int32)
+        self.first = np.zeros((size, size), dtype=np.int64)
+        self.cells = np.zeros(0, dtype=np.int64)  # flat cell of each animal
+
+    def rebuild(self, herd):
+        """ Index the herd from scratch, e.g. after everyone moved """
+        self.cells = herd.x * self.size + herd.y
+        self.count.fill(0)
+        np.add.at(self.count.reshape(-1), self.cells, ONE)
+        self.first.fill(len(herd))
+        np.minimum.at(self.first.reshape(-1), self.cells, np.arange(len(herd)))
+
+    def add(self, herd):
+        """ Index animals just appended to the herd (they come last, so first is unchanged) """
+        cells = herd.x * self.size + herd.y
+        np.add.at(self.count.reshape(-1), cells, ONE)
+        self.cells = np.concatenate([self.cells, cells])
+
+    def remove(self, keep):
+        """ Drop the animals where the boolean mask keep is False """
+        np.subtract.at(self.count.reshape(-1), self.cells[~keep], ONE)
+        self.cells = self.cells[keep]
+
+
+class ArrayField:
+    """ Field with the same rules, but each species kept in a Herd of NumPy arrays,
+    so every step is a handful of array operations however many animals there are.
+    A GridIndex per herd turns grazing, predation and drawing into whole-grid
+    operations instead of a per-generation map of who is where """
+
+    def __init__(self, size=ARRSIZE, seed=None, grass_rate=GRASS_RATE):
+        self.size = size
+        self.grass_rate = grass_rate
+        self.rng = np.random.default_rng(seed)
+        self.rabbits = Herd()
+        self.foxes = Herd()
+        self.rabbit_index = GridIndex(size)
+        self.fox_index = GridIndex(size)
+        self.field = np.ones(shape=(size, size), dtype=np.uint8)
+
+        # buffers reused every generation, so growing and drawing allocate nothing
+        self._noise = np.empty((size, size), dtype=np.float32)  # regrowth draws
+        self._mask = np.empty((size, size), dtype=bool)
+        self._frame = np.empty((size, size), dtype=np.uint8)  # display, redrawn by every color_map
+
+    def _add(self, herd, index, newcomers):
+        herd.extend(newcomers)
+        index.add(newcomers)
+
+    def _newcomer(self, animal):
+        """ A one animal herd; an Animal off our grid (Animal() places itself on an
+        ARRSIZE grid) is placed again at a random cell of ours """
+        herd = Herd.from_animals([animal])
+        if not (0 <= animal.x < self.size and 0 <= animal.y < self.size):
+            herd.x[0], herd.y[0] = self.rng.integers(0, self.size, 2)
+        return herd
+
+    def add_rabbit(self, rabbit):
+        """ A new rabbit (an Animal) is added to the field """
+        self._add(self.rabbits, self.rabbit_index, self._newcomer(rabbit))
+
+    def add_fox(self, fox):
+        self._add(self.foxes, self.fox_index, self._newcomer(fox))
+
+    def populate(self, species, n, max_offspring=1, starvation_level=1, reproduction_level=1):
+        """ Add n animals of species ("rabbits" or "foxes") at random locations in one step """
+        herd, index = self._species(species)
+        self._add(herd, index, Herd(x=self.rng.integers(0, self.size, n), y=self.rng.integers(0, self.size, n),
+                                    eaten=np.zeros(n), hunger=np.zeros(n), alive=np.ones(n),
+                                    max_offspring=np.full(n, max_offspring),
+                                    starvation_level=np.full(n, starvation_level),
+                                    reproduction_level=np.full(n, reproduction_level)))
+
+    def _species(self, species):
+        """ (herd, index) of "rabbits" or "foxes" """
+        if species == "rabbits":
+            return self.rabbits, self.rabbit_index
+        return self.foxes, self.fox_index
+
+    def reindex(self):
+        """ Rebuild both grid indexes, e.g. after the herds were replaced wholesale """
+        self.rabbit_index.rebuild(self.rabbits)
+        self.fox_index.rebuild(self.foxes)
+
+    def move(self):
+        """ All the animals move! """
+        for herd in (self.rabbits, self.foxes):
+            herd.x = (herd.x + self.rng.integers(-1, 2, len(herd))) % self.size
+            herd.y = (herd.y + self.rng.integers(-1, 2, len(herd))) % self.size
+        self.reindex()
+
+    def eat(self):
+        """ The first rabbit on a patch of grass eats it; the first fox on a cell
+        eats every rabbit there (the order of the lists, as in Field.eat).
+        Every indexed animal is alive here: survive removed the dead ones """
+        rabbits, foxes = self.rabbit_index, self.fox_index
+        grazed = (rabbits.count > 0) & (self.field > 0)
+        self.rabbits.eaten[rabbits.first[grazed]] += self.field[grazed]
+        self.field[grazed] = 0
+
+        hunted = (foxes.count > 0) & (rabbits.count > 0)
+        self.foxes.eaten[foxes.first[hunted]] += rabbits.count[hunted]
+        self.rabbits.alive[foxes.count.reshape(-1)[rabbits.cells] > 0] = False
+
+    def survive(self):
+        """ Animals who ate something live to eat another day! """
+        for species in ("rabbits", "foxes"):
+            herd, index = self._species(species)
+            hungry = herd.eaten == 0
+            herd.hunger = np.where(hungry, herd.hunger + 1, 0)
+            herd.alive &= ~(hungry & (herd.hunger >= herd.starvation_level))
+            herd.eaten[:] = 0
+            index.remove(herd.alive)
+            setattr(self, species, herd.take(herd.alive))
+
+    def grow(self):
+        """ Grass grows back with some probability at each location """
+        self.rng.random(dtype=np.float32, out=self._noise)
+        np.less(self._noise, self.grass_rate, out=self._mask)
+        np.bitwise_or(self.field, self._mask, out=self.field)
+
+    def reproduce(self):
+        """ Every fed animal has 0 to max_offspring babies, copies of itself, all born at once """
+        for herd, index in ((self.rabbits, self.rabbit_index), (self.foxes, self.fox_index)):
+            fed = herd.eaten >= herd.reproduction_level
+            babies = np.where(fed, self.rng.integers(0, herd.max_offspring + 1), 0)
+            self._add(herd, index, herd.take(np.repeat(np.arange(len(herd)), babies)))
+
+    def generation(self):
+        """ One generation of rabbits """
+        self.move()
+        self.eat()
+        self.reproduce()
+        self.survive()
+        self.grow()
+
+    def color_map(self):
+        """ Create a color map
+        Drawn into one reused frame, so each call overwrites the last one's result
+        (imshow's set_array copies the array it is given) """
+        frame = self._frame
+        np.copyto(frame, self.field)
+        np.greater(self.rabbit_index.count, 0, out=self._mask)
+        np.copyto(frame, 2, where=self._mask)  # white
+        np.greater(self.fox_index.count, 0, out=self._mask)
+        np.copyto(frame, 3, where=self._mask)  # red
+        return frame
+
+
+def _check_params(names):
+    """ TypeError for any name that isn't a setting in DEFAULTS, so a typo can't run the default """
+    unknown = sorted(set(names) - set(DEFAULTS))
+    if unknown:
+        raise TypeError(f"unknown parameter(s) {', '.join(unknown)}; expected some of {', '.join(DEFAULTS)}")
+
+
+def simulate(generations, seed=None, **params):
+    """ Run the simulation headless (no drawing) for a number of generations.
+    params override DEFAULTS; returns the rabbit and fox counts after each generation """
+    _check_params(params)
+    params = {**DEFAULTS, **params}
+    field = ArrayField(params["size"], seed, params["grass_rate"])
+    field.populate("rabbits", params["rabbits"], params["rabbit_offspring"],
+                   params["rabbit_starvation"], params["rabbit_reproduction"])
+    field.populate("foxes", params["foxes"], params["fox_offspring"],
+                   params["fox_starvation"], params["fox_reproduction"])
+
+    rabbits = np.zeros(generations, dtype=np.int64)
+    foxes = np.zeros(generations, dtype=np.int64)
+    for i in range(generations):
+        field.generation()
+        rabbits[i] = len(field.rabbits)
+        foxes[i] = len(field.foxes)
+        if rabbits[i] == 0 and foxes[i] == 0:  # nothing left to simulate, the rest stays 0
+            break
+    return {"rabbits": rabbits, "foxes": foxes}
+
+
+def _replicate(task):
+    """ Process pool worker: one simulate() run of a sweep """
+    params, generations, seed = task
+    return simulate(generations, seed, **params)
+
+
+def sweep(grid, replicates=3, generations=1000, filename="sweep.npz", workers=None, seed=0):
+    """ Run every combination of the values in grid ({param: [values]}, params as in DEFAULTS)
+    replicates times on a process pool. Writes the population time series to filename as
+    columns of equal length, one row per (run, generation):
+        config, replicate, generation, rabbits, foxes and the value of every swept param
+    Replicates get independent random streams spawned from seed, so a sweep can be repeated """
+    _check_params(grid)
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    tasks = [(config, generations, child)
+             for config, streams in zip(configs, np.random.SeedSequence(seed).spawn(len(configs)))
+             for child in streams.spawn(replicates)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_replicate, tasks))
+
+    runs = len(tasks)
+    columns = {"config": np.repeat(np.arange(runs) // replicates, generations),
+               "replicate": np.repeat(np.arange(runs) % replicates, generations),
+               "generation": np.tile(np.arange(1, generations + 1), runs),
+               "rabbits": np.concatenate([result["rabbits"] for result in results]),
+               "foxes": np.concatenate([result["foxes"] for result in results])}
+    for name in names:
+        columns[name] = np.repeat([config[name] for config, _, _ in tasks], generations)
+    np.savez_compressed(filename, **columns)
+    return columns
+
+
+def animate(i, field, im, history):
     """ Creates the animation"""
     field.generation()
     im.set_array(field.color_map())   # inject updated data into the image
     plt.title(f"generation: {i}  Nrabbits: {len(field.rabbits)}")
 
-    rabbit_pop.append(len(field.rabbits))
-    fox_pop.append(len(field.foxes))
+    history["rabbits"].append(len(field.rabbits))
+    history["foxes"].append(len(field.foxes))
 
     return im,  # don't forget the comma!
 
-def main():
+def main(field_class=ArrayField):
+    """ Animate the simulation; field_class=Field runs the original one object per animal version
+    (simulate and sweep run it without drawing) """
 
     # Create the field object (ecosystem)
-    field = Field()
+    field = field_class()
+    history = {"rabbits": [], "foxes": []}
 
     # Add some rabbits at random locations
     for _ in range(INIT_RABBITS):
@@ -199,12 +469,12 @@ def main():
     fig = plt.figure(figsize=(FIGSIZE, FIGSIZE))
     cmap = ListedColormap(['black', 'green', 'white', 'red'])
     im = plt.imshow(field.color_map(), cmap=cmap, interpolation='hamming', vmin=0, vmax=3)
-    anim = animation.FuncAnimation(fig, animate, fargs=(field, im), frames=5000, interval=1)
+    anim = animation.FuncAnimation(fig, animate, fargs=(field, im, history), frames=5000, interval=1)
     plt.show()
 
     plt.figure(figsize=(10, 5))
-    plt.plot(rabbit_pop, label="Rabbits", color='gray')
-    plt.plot(fox_pop, label="Foxes", color='red')
+    plt.plot(history["rabbits"], label="Rabbits", color='gray')
+    plt.plot(history["foxes"], label="Foxes", color='red')
     plt.xlabel("Generation")
     plt.ylabel("Population")
     plt.title("Population of Rabbits and Foxes Over Time")
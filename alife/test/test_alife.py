@@ -0,0 +1,169 @@
+"""
+
+Py test for alife.py
+
+"""
+
+import random as rnd
+import numpy as np
+import pytest
+import alife
+from alife import Animal, Field, ArrayField, GridIndex, Herd, ARRSIZE
+
+
+class MaxOffspring:
+    """ Stands in for ArrayField.rng in reproduce: every fed animal has max_offspring babies """
+
+    def integers(self, low, high, size=None):
+        return np.asarray(high) - 1
+
+
+def population(animals):
+    return [(a.x, a.y, a.hunger) for a in animals]
+
+
+def herd_population(herd):
+    return list(zip(herd.x.tolist(), herd.y.tolist(), herd.hunger.tolist()))
+
+
+def test_array_field_matches_field(monkeypatch):
+    """ Same animals, same moves and litter sizes: the same survivors and grass every generation """
+    rnd.seed(1)
+    np.random.seed(1)
+    monkeypatch.setattr(alife.rnd, "randint", lambda low, high: high)  # Field litters: max_offspring
+
+    field = Field()
+    for _ in range(800):
+        field.add_rabbit(Animal(max_offspring=1, starvation_level=2, reproduction_level=2))
+    for _ in range(100):
+        field.add_fox(Animal(max_offspring=2, starvation_level=20, reproduction_level=1))
+
+    arrays = ArrayField(ARRSIZE)
+    arrays.rabbits = Herd.from_animals(field.rabbits)
+    arrays.foxes = Herd.from_animals(field.foxes)
+    arrays.rng = MaxOffspring()
+
+    for _ in range(30):
+        field.move()  # random, so ArrayField takes the same steps
+        for herd, animals in ((arrays.rabbits, field.rabbits), (arrays.foxes, field.foxes)):
+            herd.x = np.array([a.x for a in animals])
+            herd.y = np.array([a.y for a in animals])
+        arrays.reindex()
+
+        field.eat()
+        arrays.eat()
+        assert (arrays.field == field.field).all()
+
+        field.reproduce()
+        arrays.reproduce()
+        field.survive()
+        arrays.survive()
+        assert herd_population(arrays.rabbits) == population(field.rabbits)
+        assert herd_population(arrays.foxes) == population(field.foxes)
+        assert (arrays.rabbit_index.count.sum(), arrays.fox_index.count.sum()) == (len(field.rabbits), len(field.foxes))
+
+        field.grow()  # random too: carry Field's regrowth over
+        arrays.field[:] = field.field
+        assert (arrays.color_map() == field.color_map()).all()
+
+    assert len(field.rabbits) > 0 and len(field.foxes) > 0
+
+
+def test_grid_index():
+    rng = np.random.default_rng(0)
+    herd = Herd(x=rng.integers(0, 10, 500), y=rng.integers(0, 10, 500))
+    index = GridIndex(10)
+    index.rebuild(herd)
+
+    expected = np.zeros((10, 10), dtype=int)
+    first = np.full((10, 10), len(herd))
+    for i, (x, y) in enumerate(zip(herd.x, herd.y)):
+        expected[x, y] += 1
+        first[x, y] = min(first[x, y], i)
+    assert (index.count == expected).all()
+    assert (index.first[expected > 0] == first[expected > 0]).all()
+
+    newcomers = Herd(x=[3, 3], y=[4, 4])
+    index.add(newcomers)
+    expected[3, 4] += 2
+    assert (index.count == expected).all()
+
+    keep = np.ones(len(herd) + 2, dtype=bool)
+    keep[:100] = False
+    index.remove(keep)
+    for x, y in zip(herd.x[:100], herd.y[:100]):
+        expected[x, y] -= 1
+    assert (index.count == expected).all()
+    assert len(index.cells) == len(herd) - 98
+
+
+def test_simulate_repeats():
+    first = alife.simulate(20, seed=5, size=50, rabbits=200, foxes=20)
+    second = alife.simulate(20, seed=5, size=50, rabbits=200, foxes=20)
+    assert (first["rabbits"] == second["rabbits"]).all() and (first["foxes"] == second["foxes"]).all()
+
+
+def test_add_animals_to_small_field():
+    """ Animals placed for the default grid end up on a smaller field's grid """
+    rnd.seed(2)
+    small = ArrayField(size=20, seed=0)
+    for _ in range(50):
+        small.add_rabbit(Animal())
+        small.add_fox(Animal())
+    for herd, index in ((small.rabbits, small.rabbit_index), (small.foxes, small.fox_index)):
+        assert ((0 <= herd.x) & (herd.x < 20) & (0 <= herd.y) & (herd.y < 20)).all()
+        assert index.count.sum() == 50
+
+    inside = Animal()
+    inside.x, inside.y = 3, 4
+    small.add_rabbit(inside)  # already on the grid: stays put
+    assert (small.rabbits.x[-1], small.rabbits.y[-1]) == (3, 4)
+    small.generation()
+
+
+def test_sweep(tmp_path):
+    grid = {"grass_rate": [0.3, 0.6], "size": [30]}
+    path = tmp_path / "sweep.npz"
+    alife.sweep(grid, replicates=2, generations=5, filename=str(path), workers=2, seed=7)
+
+    with np.load(path) as saved:
+        columns = dict(saved)
+    assert set(columns) == {"config", "replicate", "generation", "rabbits", "foxes", "grass_rate", "size"}
+    assert all(column.shape == (2 * 2 * 5,) for column in columns.values())
+    assert columns["config"].tolist() == [0] * 10 + [1] * 10
+    assert columns["grass_rate"].tolist() == [0.3] * 10 + [0.6] * 10
+    assert columns["generation"].tolist()[:5] == [1, 2, 3, 4, 5]
+
+    again = alife.sweep(grid, replicates=2, generations=5, filename=str(tmp_path / "again.npz"), workers=2, seed=7)
+    assert all((again[name] == columns[name]).all() for name in columns)
+
+    with pytest.raises(TypeError):
+        alife.sweep({"grass_rte": [0.3]}, filename=str(tmp_path / "typo.npz"))
+
+
+def test_clone_keeps_subclass():
+    class Fox(Animal):
+        __slots__ = ()
+
+    fox = Fox(max_offspring=3, starvation_level=7, reproduction_level=2)
+    fox.eaten, fox.hunger = 4, 1
+    litter = fox.litter(3)
+    for baby in [fox.clone(), fox.reproduce()] + litter:
+        assert type(baby) is Fox and baby is not fox
+        assert [getattr(baby, name) for name in Animal.__slots__] == [getattr(fox, name) for name in Animal.__slots__]
+    assert len(litter) == 3 and len({id(baby) for baby in litter}) == 3
+    assert not hasattr(fox, "__dict__")  # slots all the way down
+
+
+def test_grow_in_place():
+    field = ArrayField(size=100, seed=0, grass_rate=0.5)
+    field.field[:] = 0
+    field.field[:10] = 1
+    grass = field.field
+    field.grow()
+    assert field.field is grass and grass.dtype == np.uint8
+    assert (grass[:10] == 1).all()  # grass never shrinks
+    assert 0.4 < grass[10:].mean() < 0.6
+    for _ in range(40):
+        field.grow()
+    assert set(np.unique(grass).tolist()) == {1}  # capped at 1, however often it grows back